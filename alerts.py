@@ -0,0 +1,129 @@
+import itertools
+import threading
+from collections import deque
+from typing import NamedTuple
+
+import pandas as pd
+
+
+class Alert(NamedTuple):
+    id: int
+    location: str
+    column: str
+    kind: str
+    value: float
+    created_at: pd.Timestamp
+
+
+# alert when a column leaves [low, high]. the alert is cleared only once the
+# value is back inside the range by at least hysteresis, and a location does not
+# get the same kind of alert again within cooldown seconds, so a value
+# oscillating around a threshold does not flood the sinks.
+class ThresholdRule:
+
+    def __init__(
+        self,
+        column: str,
+        low: float,
+        high: float,
+        hysteresis: float = 0.5,
+        cooldown: float = 15 * 60,
+    ):
+        self.column = column
+        self.low = low
+        self.high = high
+        self.hysteresis = hysteresis
+        self.cooldown = pd.Timedelta(seconds=cooldown)
+
+    def evaluate(self, value: float, active: str):
+        # returns the kind of alert that is active after value, or None
+        if pd.isna(value):
+            return active
+        if value < self.low:
+            return "Low"
+        if value > self.high:
+            return "High"
+        if active == "Low" and value < self.low + self.hysteresis:
+            return active
+        if active == "High" and value > self.high - self.hysteresis:
+            return active
+        return None
+
+
+# evaluates the rules once per new measurement for all locations, independent
+# of open sessions, and dispatches new alerts to the sinks. sinks are callables
+# taking an Alert.
+class AlertEngine:
+
+    def __init__(self, rules: list, sinks: list = None, history: int = 100):
+        self.rules = rules
+        self.sinks = sinks or []
+        self.ids = itertools.count(1)
+        # (location, column) -> kind of the active alert
+        self.active = {}
+        # (location, column, kind) -> time of the last dispatched alert
+        self.last_sent = {}
+        self.history = deque(maxlen=history)
+        # location -> time of the last evaluated measurement
+        self.last_processed = {}
+        self.lock = threading.Lock()
+
+    def process(self, location: str, df: pd.DataFrame):
+        # df is sorted by created_at. measurements that are not newer than the
+        # last evaluated one, e.g. backfilled history or rows passed on twice,
+        # are skipped, so each measurement is evaluated once and in order.
+        with self.lock:
+            last_processed = self.last_processed.get(location)
+            if last_processed is not None:
+                df = df[df["created_at"] > last_processed]
+            if df.empty:
+                return
+            self.last_processed[location] = df["created_at"].iloc[-1]
+            for row in df.itertuples(index=False):
+                for rule in self.rules:
+                    self._evaluate(location, rule, row)
+
+    def _evaluate(self, location: str, rule: ThresholdRule, row):
+        key = (location, rule.column)
+        value = getattr(row, rule.column)
+        active = self.active.get(key)
+        kind = rule.evaluate(value, active)
+        self.active[key] = kind
+        if kind is None or kind == active:
+            return
+        last_sent = self.last_sent.get((*key, kind))
+        if last_sent is not None and row.created_at - last_sent < rule.cooldown:
+            return
+        self.last_sent[(*key, kind)] = row.created_at
+        alert = Alert(
+            next(self.ids), location, rule.column, kind, value, row.created_at
+        )
+        self.history.append(alert)
+        for sink in self.sinks:
+            try:
+                sink(alert)
+            except Exception as e:
+                print(f"Failed to dispatch alert {alert}: {e}")
+
+    def active_alerts(self, location: str) -> dict:
+        # column -> kind of the active alerts of location
+        with self.lock:
+            return {
+                column: kind
+                for (location_, column), kind in self.active.items()
+                if location_ == location and kind is not None
+            }
+
+    def alerts_since(self, location: str, alert_id: int) -> list:
+        with self.lock:
+            return [
+                alert
+                for alert in self.history
+                if alert.location == location and alert.id > alert_id
+            ]
+
+    def last_alert_id(self) -> int:
+        # alerts_since(location, last_alert_id()) returns only the alerts
+        # raised from now on
+        with self.lock:
+            return self.history[-1].id if self.history else 0
@@ -1,11 +1,30 @@
+import functools
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
 import altair as alt
 import pandas as pd
 import streamlit as st
-import re
-import requests
-from st_supabase_connection import SupabaseConnection, execute_query
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from streamlit_autorefresh import st_autorefresh
-from streamlit_push_notifications import send_alert, send_push
+
+import instrumentation
+from alerts import AlertEngine, ThresholdRule
+from config import load_config, site_of
+from live_updates import MeasurementPoller, MeasurementPublisher
+from archive import MeasurementArchive
+from charts import (
+    build_calendar_chart,
+    build_heatmap_chart,
+    build_measurement_chart,
+    sunrise_sunset_columns,
+)
+from export import export_formats, export_measurements, export_resolutions
+from measurement_store import MeasurementStore
+from pipeline import LocationPipeline, last_valid, make_range_spec
+from rollups import RollupStore
+from snapshot import MeasurementSnapshot
 
 st.set_page_config(
     page_title="HW7 T&H",
@@ -13,104 +32,254 @@ st.set_page_config(
     layout="centered",
 )
 
-st_supabase_client = st.connection(
-    name="supabase",
-    type=SupabaseConnection,
-    ttl=None,
-)
+# settings, see config.py for their defaults and how to override them
+
+
+@st.cache_resource
+def get_config() -> dict:
+    return load_config()
+
+
+config = get_config()
+sites = config["sites"]
+default_enable_auto_refresh = config["default_enable_auto_refresh"]
+default_enable_lazy_loading = config["default_enable_lazy_loading"]
+default_enable_compare_mode = config["default_enable_compare_mode"]
+default_enable_live_updates = config["default_enable_live_updates"]
+default_enable_notifications = config["default_enable_notifications"]
+default_enable_notification_sound = config["default_enable_notification_sound"]
+default_display_temp = config["default_display_temp"]
+default_display_humidty = config["default_display_humidty"]
+default_display_temp_mean = config["default_display_temp_mean"]
+default_display_humidty_mean = config["default_display_humidty_mean"]
+default_display_sunrise_sunset = config["default_display_sunrise_sunset"]
+default_min_temp_threshold = config["default_min_temp_threshold"]
+default_max_temp_threshold = config["default_max_temp_threshold"]
+default_min_humid_threshold = config["default_min_humid_threshold"]
+default_max_humid_threshold = config["default_max_humid_threshold"]
+temp_alert_hysteresis = config["temp_alert_hysteresis"]
+humid_alert_hysteresis = config["humid_alert_hysteresis"]
+alert_cooldown = config["alert_cooldown"]
+sound_path = config["sound_path"]
+refresh_interval = config["refresh_interval"]
+live_update_interval = config["live_update_interval"]
+start_of_recording_date = config["start_of_recording_date"]
+rollups_dir = config["rollups_dir"]
+max_chart_points = config["max_chart_points"]
+chart_points = config["chart_points"]
+fetch_page_size = config["fetch_page_size"]
+snapshot_window_hours = config["snapshot_window_hours"]
+enable_sunrise_sunset = config["enable_sunrise_sunset"]
+sunrise_sunset_cache_path = config["sunrise_sunset_cache_path"]
+sunrise_sunset_offline = config["sunrise_sunset_offline"]
+enable_notifications = config["enable_notifications"]
+archive_dir = config["archive_dir"]
+use_database = config["use_database"]
+default_enable_profiling = config["default_enable_profiling"]
+cube_view_ranges = config["cube_view_ranges"]
+view_modes = ["Chart", "Heatmap", "Calendar"]
+raw_data_page_size = config["raw_data_page_size"]
+profile_log_path = config["profile_log_path"] or None
+enable_prewarm = config["enable_prewarm"]
+prewarm_ranges = config["prewarm_ranges"]
+
+
+@st.cache_resource
+def get_supabase_client():
+    # connected on first use, and not at all if the dashboard is served from
+    # the archive alone
+    if not use_database:
+        return None
+    from st_supabase_connection import SupabaseConnection
+
+    connection = st.connection(
+        name="supabase",
+        type=SupabaseConnection,
+        ttl=None,
+    )
+    # the connection only exposes table and auth, the batched snapshot needs
+    # rpc of the underlying supabase client
+    return connection.client
+
+
+def start_run_profile(name: str, fragment: bool = False):
+    # a full run is profiled as a whole, a fragment that reruns on its own gets
+    # a profile of its own
+    if fragment and instrumentation.active_profile() is not None:
+        return None
+    show_profile = st.session_state.get("show_profile", default_enable_profiling)
+    if not show_profile and profile_log_path is None:
+        instrumentation.current_profile.set(None)
+        return None
+    return instrumentation.start_profile(name)
+
+
+def finish_run_profile(profile):
+    if profile is None:
+        return
+    profile.finish()
+    if profile_log_path is not None:
+        profile.write_log(profile_log_path)
+    if st.session_state.get("show_profile", default_enable_profiling):
+        with st.expander(
+            f"Performance: {profile.name} ({profile.duration * 1000:.0f} ms)"
+        ):
+            st.dataframe(profile.spans_frame(), hide_index=True)
+            st.dataframe(pd.Series(profile.counters, name="value", dtype=int))
+
+
+def profiled(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = start_run_profile(func.__name__, fragment=True)
+        with instrumentation.span(func.__name__):
+            func(*args, **kwargs)
+        finish_run_profile(profile)
+
+    return wrapper
+
+
+script_profile = start_run_profile("script")
+
+
+@st.cache_resource
+def get_archive() -> MeasurementArchive:
+    return MeasurementArchive(archive_dir)
+
+
+@st.cache_resource
+def get_publisher() -> MeasurementPublisher:
+    return MeasurementPublisher()
+
+
+@st.cache_resource
+def get_measurement_store(location: str) -> MeasurementStore:
+    # shared between all sessions, so each new measurement is only fetched once.
+    # every row added to the store is published, whether it was fetched by
+    # the poller, a session or the snapshot.
+    return MeasurementStore(
+        get_supabase_client(),
+        location,
+        refresh_interval=refresh_interval,
+        page_size=fetch_page_size,
+        archive=get_archive(),
+        on_new=get_publisher().publish,
+    )
+
+
+@st.cache_resource
+def get_rollup_store(location: str) -> RollupStore:
+    return RollupStore(rollups_dir, location)
+
+
+@st.cache_resource
+def get_pipeline(location: str) -> LocationPipeline:
+    # shared between all sessions, so each view is computed once for all viewers
+    if enable_sunrise_sunset:
+        site = site_of(config, location)
+        get_sunrise_sunset = functools.partial(
+            get_sunrise_sunset_data, lat=site["lat"], lon=site["lon"]
+        )
+    else:
+        get_sunrise_sunset = no_sunrise_sunset
+    return LocationPipeline(
+        get_measurement_store(location),
+        get_rollup_store(location),
+        get_sunrise_sunset,
+        chart_points=chart_points,
+    )
+
+
+@st.cache_resource
+def get_snapshot() -> MeasurementSnapshot:
+    # the locations and the new measurements of all locations in one request
+    return MeasurementSnapshot(
+        get_supabase_client(),
+        get_measurement_store,
+        window=pd.Timedelta(hours=snapshot_window_hours),
+        refresh_interval=refresh_interval,
+        archive=get_archive(),
+    )
+
 
-# settings
-
-LAT = 49.879244743989915
-LON = 8.667196238775123
-
-default_enable_auto_refresh = False
-default_enable_notifications = False
-default_enable_notification_sound = False
-default_display_temp = True
-default_display_humidty = True
-default_display_temp_mean = True
-default_display_humidty_mean = True
-default_display_sunrise_sunset = False
-default_min_temp_threshold = 15
-default_max_temp_threshold = 25
-default_min_humid_threshold = 0
-default_max_humid_threshold = 65
-sound_path = "https://cdn.pixabay.com/audio/2022/12/12/audio_e6f0105ae1.mp3"
-refresh_interval = 60
-start_of_recording_date = "2024-11-12"
-
-
-def fetch_data(from_date, to_date, location: str):
-
-    return execute_query(
-        st_supabase_client.table("measurements")
-        .select("*")
-        .eq("location", location)
-        .order("created_at", desc=True)
-        .gte("created_at", from_date)
-        .lte("created_at", to_date),
-        ttl="1m",
-    ).data
+@st.cache_resource
+def get_measurement_poller() -> MeasurementPoller:
+    # one polling thread per process, shared by all sessions
+    poller = MeasurementPoller(get_snapshot(), poll_interval=live_update_interval)
+    poller.start()
+    return poller
+
+
+@st.cache_resource
+def get_alert_engine() -> AlertEngine:
+    # evaluated once per new measurement in the thread that adds it to a
+    # store, sessions only display and deliver the alerts
+    alert_engine = AlertEngine(
+        rules=[
+            ThresholdRule(
+                "temperature",
+                default_min_temp_threshold,
+                default_max_temp_threshold,
+                hysteresis=temp_alert_hysteresis,
+                cooldown=alert_cooldown,
+            ),
+            ThresholdRule(
+                "humidity",
+                default_min_humid_threshold,
+                default_max_humid_threshold,
+                hysteresis=humid_alert_hysteresis,
+                cooldown=alert_cooldown,
+            ),
+        ]
+    )
+    get_publisher().subscribe(alert_engine.process)
+    return alert_engine
 
 
 def get_last_timestamp(location: str):
-    return execute_query(
-        st_supabase_client.table("measurements")
-        .select("created_at")
-        .eq("location", location)
-        .order("created_at", desc=True)
-        .limit(1),
-        ttl="1m",
-    ).data[0]["created_at"]
+    # the stores are brought up to date by the snapshot, so this only costs a
+    # request for locations it does not cover
+    store = get_measurement_store(location)
+    with instrumentation.span("get_last_timestamp"):
+        store.refresh()
+    return store.last_timestamp
 
 
-@st.cache_data
-def get_sunrise_sunset_data(
-    date_start: str, date_end: str, timezone="UTC"
-) -> pd.DataFrame:
-    # assert date is in YYYY-MM-DD format
-    regex = re.compile(r"\d{4}-\d{2}-\d{2}")
-    assert regex.match(date_start) and regex.match(date_end), "Invalid date format."
-
-    url = f"""
-    https://api.sunrisesunset.io/json?
-    timezone={timezone}
-    &lat={LAT}
-    &lng={LON}
-    &date_start={date_start}
-    &date_end={date_end}
-    """
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        raw_results = response.json()["results"]
-        df = pd.DataFrame(raw_results)
-        # convert 12-hour time to 24-hour time
-        keys_to_convert = list(df.columns)
-        keys_to_keep = ["date", "timezone", "day_length", "utc_offset"]
-        keys_to_convert = [key for key in keys_to_convert if key not in keys_to_keep]
-        for key in keys_to_convert:
-            df[key] = pd.to_datetime(df[key], format="%I:%M:%S %p").dt.strftime(
-                "%H:%M:%S"
-            )
+@st.cache_resource
+def get_sunrise_sunset_cache():
+    from sunrise_sunset import SunriseSunsetCache
 
-        # merge time columns with date
-        for key in keys_to_convert:
-            df[key] = df["date"] + " " + df[key]
+    return SunriseSunsetCache(sunrise_sunset_cache_path)
 
-        # round to nearest minute
-        for key in keys_to_convert:
-            df[key] = pd.to_datetime(df[key]).dt.round("1min")
 
-        # set timezone
-        for key in keys_to_convert:
-            df[key] = df[key].dt.tz_localize("UTC").dt.tz_convert(timezone)
+@st.cache_data
+def get_sunrise_sunset_data(
+    date_start: str, date_end: str, lat: float, lon: float, timezone="UTC"
+) -> pd.DataFrame:
+    # only imported if sunrise and sunset are enabled
+    import sunrise_sunset
+
+    # only counted when the data is not served from st.cache_data
+    instrumentation.count("sunrise_sunset_data_misses")
+    return sunrise_sunset.get_sunrise_sunset_data(
+        date_start,
+        date_end,
+        lat=lat,
+        lon=lon,
+        timezone=timezone,
+        cache=get_sunrise_sunset_cache(),
+        offline=sunrise_sunset_offline,
+    )
 
-        return df
 
-    else:
-        raise ValueError("Failed to fetch sunrise/sunset data.")
+def no_sunrise_sunset(date_start: str, date_end: str) -> pd.DataFrame:
+    # sunrise and sunset are disabled, so there are no markers
+    return pd.DataFrame(
+        {
+            "sunrise": pd.Series(dtype="datetime64[ns, UTC]"),
+            "sunset": pd.Series(dtype="datetime64[ns, UTC]"),
+        }
+    )
 
 
 st.title("🌡️ Temperature & Humidity")
@@ -124,29 +293,38 @@ with st.expander("Settings", expanded=False):
         help=f"Refresh every {refresh_interval} seconds.",
     )
 
-    # toggle for notifications
-    notifications_toggle = st.checkbox(
-        "Notifications",
-        value=default_enable_notifications,
-        help="Receive notifications when the temperature or humidity exceeds the threshold.",
+    # toggle for live updates
+    live_updates = st.checkbox(
+        "Live Updates",
+        value=default_enable_live_updates,
+        help="Update as soon as a new measurement arrives instead of refreshing periodically.",
+    )
+
+    # toggle for lazy loading
+    enable_lazy_loading = st.checkbox(
+        "Lazy Loading",
+        value=default_enable_lazy_loading,
+        help="Only fetch and display the selected date range instead of all tabs.",
     )
+
+    # toggle for notifications, if they are enabled
+    notifications_toggle = False
+    if enable_notifications:
+        notifications_toggle = st.checkbox(
+            "Notifications",
+            value=default_enable_notifications,
+            help="Receive notifications when the temperature or humidity exceeds the threshold.",
+        )
     if notifications_toggle:
         enable_sound = st.checkbox(
             "Enable Sound",
             value=default_enable_notification_sound,
             help="Play a sound when a notification is received.",
         )
-        temp_slider = st.slider(
-            "Temperature Threshold",
-            min_value=0,
-            max_value=40,
-            value=(default_min_temp_threshold, default_max_temp_threshold),
-        )
-        humid_slider = st.slider(
-            "Humidity Threshold",
-            min_value=0,
-            max_value=100,
-            value=(default_min_humid_threshold, default_max_humid_threshold),
+        st.caption(
+            f"Temperature Threshold: {default_min_temp_threshold} - "
+            f"{default_max_temp_threshold} °C, Humidity Threshold: "
+            f"{default_min_humid_threshold} - {default_max_humid_threshold} %"
         )
 
     st.subheader("Display Settings")
@@ -175,407 +353,572 @@ with st.expander("Settings", expanded=False):
         help="Display humidity measurements.",
     )
 
-    display_sunrise_sunset = display_columns[0].checkbox(
-        "Display Sunrise & Sunset",
-        value=default_display_sunrise_sunset,
-        help="Display vertical lines for sunrise and sunset times.",
+    display_sunrise_sunset = False
+    if enable_sunrise_sunset:
+        display_sunrise_sunset = display_columns[0].checkbox(
+            "Display Sunrise & Sunset",
+            value=default_display_sunrise_sunset,
+            help="Display vertical lines for sunrise and sunset times.",
+        )
+
+    st.checkbox(
+        "Performance Panel",
+        value=default_enable_profiling,
+        key="show_profile",
+        help="Show where the time of each run is spent, takes effect on the next run.",
     )
 
-# get all locations in the database from the measurements table
-locations = execute_query(
-    st_supabase_client.table("locations").select("location"),
-    ttl="1m",
-).data
-# convert to list and remove 'test' location
-locations = [l["location"] for l in locations if l["location"] != "test"]
-# dropdown for selecting location
-location = st.selectbox("Location", locations)
+# with live updates, the alerts and the displayed ranges rerun on their own to
+# pick up the measurements published by the poller. a rerun without a new
+# measurement is served from the shared view cache, and the rest of the page is
+# not rerun.
+live_run_every = live_update_interval if live_updates else None
+
+# the alert engine subscribes before the first measurements are added
+get_alert_engine()
+# get all locations and bring their measurements up to date in one request,
+# all tabs are served from the result
+snapshot = get_snapshot()
+with instrumentation.span("snapshot"):
+    snapshot.refresh()
+# remove 'test' location
+locations = [l for l in snapshot.locations if l != "test"]
+if len(sites) > 1:
+    # only the locations of the selected site
+    site = st.selectbox("Site", [site["name"] for site in sites])
+    locations = [l for l in locations if site_of(config, l)["name"] == site]
+compare_mode = st.toggle(
+    "Compare Locations",
+    value=default_enable_compare_mode,
+    help="Overlay the measurements of several locations in one chart.",
+)
+if compare_mode:
+    compared_locations = st.multiselect(
+        "Locations", locations, default=locations[:2], placeholder="Locations"
+    )
+    displayed_locations = compared_locations
+else:
+    # dropdown for selecting location
+    location = st.selectbox("Location", locations)
+    displayed_locations = [location]
+
+# alerts are evaluated for all locations in the background
+get_measurement_poller()
+
+
+@st.fragment(run_every=live_run_every)
+def render_alerts(location: str):
+    alert_engine = get_alert_engine()
+    for column, kind in alert_engine.active_alerts(location).items():
+        st.warning(f"{kind} {column.capitalize()}", icon="⚠️")
+
+    key = f"alert_id_{location}"
+    if not notifications_toggle:
+        # alerts raised while notifications are off are not pushed later
+        st.session_state.pop(key, None)
+    else:
+        from streamlit_push_notifications import send_push
+
+        # only alerts raised after notifications were turned on are pushed,
+        # not the ones of the history that may have cleared long ago
+        if key not in st.session_state:
+            st.session_state[key] = alert_engine.last_alert_id()
+        # push the latest new alert per column that has not been sent to this
+        # session yet
+        alerts = alert_engine.alerts_since(location, st.session_state[key])
+        for alert in {alert.column: alert for alert in alerts}.values():
+            if alert.column == "temperature":
+                body = f"⚠️ Current Temperature is {alert.value} °C"
+            else:
+                body = f"⚠️ Humidity is {alert.value} %"
+            send_push(
+                title=f"{alert.kind} {alert.column.capitalize()} Alert",
+                body=body,
+                sound_path=(sound_path if enable_sound else None),
+            )
+        if alerts:
+            st.session_state[key] = alerts[-1].id
+
+
+for l in displayed_locations:
+    render_alerts(l)
 
 date_ranges = ["1h", "6h", "24h", "7d", "30d", "Max", "Custom"]
-tabs = st.tabs(date_ranges)
-
-
-
-for tab, date_range in zip(tabs, date_ranges):
-
-    with tab:
-        data = None
-        to_date = get_last_timestamp(location=location)
-        to_date = pd.Timestamp(to_date)
-        if date_range == "1h":
-            hours = 1
-            from_date = to_date - pd.Timedelta(hours=hours)
-            from_date_fetch = to_date - pd.Timedelta(hours=hours * 2)
-            data = fetch_data(from_date_fetch, to_date, location)
-            rolling_average = 5  # 5 minutes
-            rolling_average_display = "5 mins"
-        elif date_range == "6h":
-            hours = 6
-            from_date = to_date - pd.Timedelta(hours=hours)
-            from_date_fetch = to_date - pd.Timedelta(hours=hours * 2)
-            data = fetch_data(from_date_fetch, to_date, location)
-            rolling_average = 60
-            rolling_average_display = "1 hour"
-        elif date_range == "24h":
-            hours = 24
-            from_date = to_date - pd.Timedelta(hours=hours)
-            from_date_fetch = to_date - pd.Timedelta(hours=hours * 2)
-            data = fetch_data(from_date_fetch, to_date, location)
-            rolling_average = 360  # 4 hours
-            rolling_average_display = "6 hours"
-        elif date_range == "7d":
-            hours = 24 * 7
-            from_date = to_date - pd.Timedelta(hours=hours)
-            from_date_fetch = to_date - pd.Timedelta(hours=hours * 2)
-            data = fetch_data(from_date_fetch, to_date, location)
-            rolling_average = 1440  # 1 day
-            rolling_average_display = "1 day"
-        elif date_range == "30d":
-            hours = 24 * 30
-            from_date = to_date - pd.Timedelta(hours=hours)
-            from_date_fetch = to_date - pd.Timedelta(hours=hours * 2)
-            data = fetch_data(from_date_fetch, to_date, location)
-            rolling_average = 10080  # 7 days
-            rolling_average_display = "7 days"
-        elif date_range == "Max":
-            from_date = pd.Timestamp(start_of_recording_date)
-            data = fetch_data(from_date, to_date, location)
-            rolling_average = 10080  # 7 days
-            rolling_average_display = "7 days"
-        elif date_range == "Custom":
-            date_from, hour_from = st.columns(2)
-            date_to, hour_to = st.columns(2)
-            date_from = date_from.date_input(
-                "From Date",
-                pd.Timestamp.utcnow() - pd.Timedelta(days=1),
-                format="DD/MM/YYYY",
-            )
-            hour_from = hour_from.time_input("From Time", pd.Timestamp.utcnow())
-            date_to = date_to.date_input(
-                "To Date", pd.Timestamp.utcnow(), format="DD/MM/YYYY"
-            )
-            hour_to = hour_to.time_input("To Time", pd.Timestamp.utcnow())
+# date range -> hours, rolling average in minutes and its display name. the Max
+# range starts at start_of_recording_date.
+date_range_settings = {
+    "1h": (1, 5, "5 mins"),
+    "6h": (6, 60, "1 hour"),
+    "24h": (24, 360, "6 hours"),
+    "7d": (24 * 7, 1440, "1 day"),
+    "30d": (24 * 30, 10080, "7 days"),
+    "Max": (None, 10080, "7 days"),
+}
+
+
+def get_from_date(hours, to_date):
+    if hours is None:
+        return pd.Timestamp(start_of_recording_date)
+    return to_date - pd.Timedelta(hours=hours)
+
+
+@st.cache_resource
+def start_prewarm() -> threading.Thread:
+    # once per process, on its first run: compute the views of prewarm_ranges
+    # for all locations in the background, so that the next viewers find them
+    # in the shared caches. the locations, latest timestamps and recent
+    # windows are already loaded by the snapshot. the streamlit caches need
+    # the script run context in the thread, like in map_concurrently.
+    ctx = get_script_run_ctx()
+
+    def prewarm():
+        try:
+            for l in get_snapshot().locations:
+                if l == "test":
+                    continue
+                pipeline = get_pipeline(l)
+                to_date = pipeline.store.last_timestamp
+                if to_date is None:
+                    continue
+                for date_range in prewarm_ranges:
+                    hours, rolling_average, _ = date_range_settings[date_range]
+                    pipeline.view(
+                        make_range_spec(
+                            get_from_date(hours, to_date),
+                            to_date,
+                            rolling_average,
+                            max_points=max_chart_points,
+                        )
+                    )
+        except Exception:
+            # the views are computed on demand instead
+            print("Failed to prewarm the caches:")
+            traceback.print_exc()
+
+    thread = threading.Thread(target=prewarm, name="prewarm", daemon=True)
+    add_script_run_ctx(thread, ctx)
+    thread.start()
+    return thread
+
+
+if enable_prewarm:
+    start_prewarm()
+
+
+@st.fragment
+def render_raw_data(df: pd.DataFrame, key: str):
+    # only the selected page is sent to the browser, turning the page only
+    # reruns this fragment
+    pages = max(1, -(-len(df) // raw_data_page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=key)
+    start = (page - 1) * raw_data_page_size
+    end = min(start + raw_data_page_size, len(df))
+    st.dataframe(df.iloc[start:end])
+    st.caption(f"Rows {start + 1 if end else 0} - {end} of {len(df)}")
+
+
+@st.fragment(run_every=live_run_every)
+@profiled
+def render_date_range(date_range: str):
+    # the custom range is only loaded on request
+    load_range = date_range != "Custom"
+    to_date = get_last_timestamp(location=location)
+    to_date = pd.Timestamp(to_date)
+    if date_range in date_range_settings:
+        hours, rolling_average, rolling_average_display = date_range_settings[
+            date_range
+        ]
+        from_date = get_from_date(hours, to_date)
+    elif date_range == "Custom":
+        date_from, hour_from = st.columns(2)
+        date_to, hour_to = st.columns(2)
+        date_from = date_from.date_input(
+            "From Date",
+            pd.Timestamp.utcnow() - pd.Timedelta(days=1),
+            format="DD/MM/YYYY",
+        )
+        hour_from = hour_from.time_input("From Time", pd.Timestamp.utcnow())
+        date_to = date_to.date_input(
+            "To Date", pd.Timestamp.utcnow(), format="DD/MM/YYYY"
+        )
+        hour_to = hour_to.time_input("To Time", pd.Timestamp.utcnow())
 
-            from_date = pd.Timestamp(f"{date_from} {hour_from}")
-            to_date = pd.Timestamp(f"{date_to} {hour_to}")
+        from_date = pd.Timestamp(f"{date_from} {hour_from}")
+        to_date = pd.Timestamp(f"{date_to} {hour_to}")
 
-            enabled = from_date < to_date
+        enabled = from_date < to_date
 
-            st.button(
-                ":material/refresh:",
-                key="load_data",
-                type="secondary",
-                disabled=not enabled,
-            )
-            if st.session_state.get("load_data"):
-                data = fetch_data(from_date, to_date, location)
-                rolling_average = None
-        else:
-            raise ValueError("Invalid date range")
+        st.button(
+            ":material/refresh:",
+            key="load_data",
+            type="secondary",
+            disabled=not enabled,
+        )
+        if st.session_state.get("load_data"):
+            load_range = True
+            rolling_average = 60
+            rolling_average_display = "1 hour"
+    else:
+        raise ValueError("Invalid date range")
 
-        if data is not None:
+    if load_range:
 
-            df = pd.DataFrame(data)
-            df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+        spec = make_range_spec(
+            from_date, to_date, rolling_average, max_points=max_chart_points
+        )
+        view = get_pipeline(location).view(spec)
+        df = view.df
+        stats = view.statistics
+
+        latest_temperature = view.latest_temperature
+        latest_humidity = view.latest_humidity
+
+        metric_cols = st.columns(2)
+        mean_temp = stats["temperature_mean"]
+        delta_temp = latest_temperature - mean_temp
+        delta_color = "off"
+        delta_temp = round(delta_temp, 1)
+        metric_cols[0].metric(
+            "Live Temperature",
+            f"{latest_temperature:.1f} °C",
+            f"{delta_temp:.1f} °C",
+            delta_color,
+            help=f"Temperature in Celsius compared to the average temperature in the last {date_range}.",
+        )
 
-            # resample data to 1 minute intervals and use the latest value
-            df = df.resample("1min", on="created_at").last().reset_index()
+        mean_humidity = stats["humidity_mean"]
+        delta_humidity = latest_humidity - mean_humidity
+        delta_color = "inverse"
+        delta_humidity = round(delta_humidity, 1)
+        metric_cols[1].metric(
+            "Live Humidity",
+            f"{latest_humidity:.1f} %",
+            f"{delta_humidity:.1f} %",
+            delta_color,
+            help=f"Humidity compared to the average humidity in the last {date_range}.",
+        )
 
-            # compute rolling mean for temperature and humidity
-            df["temperature_mean"] = (
-                df["temperature"]
-                .rolling(window=rolling_average, min_periods=rolling_average // 2)
-                .mean()
-            )
-            df["humidity_mean"] = (
-                df["humidity"]
-                .rolling(window=rolling_average, min_periods=rolling_average // 2)
-                .mean()
+        view_mode = "Chart"
+        if date_range in cube_view_ranges:
+            view_mode = st.segmented_control(
+                "View",
+                view_modes,
+                default=view_modes[0],
+                key=f"view_mode_{date_range}",
+                label_visibility="collapsed",
             )
-            # now that the rolling mean is computed, drop the fetched data that is not
-            # needed anymore, ie drop everything that is older than from_date
-            
-            # coonvert from_date and created_at to tz-naive for comparison
-            from_date = from_date.tz_localize(None)
-            df["created_at"] = df["created_at"].dt.tz_localize(None)
-            df = df[df["created_at"] >= from_date].reset_index(drop=True)
-            # make created_at tz-aware again
-            df["created_at"] = df["created_at"].dt.tz_localize("UTC")
-
-            latest_temperature = df["temperature"].iloc[-1]
-            latest_humidity = df["humidity"].iloc[-1]
-
-            if notifications_toggle:
-                temp_too_low = latest_temperature < temp_slider[0]
-                temp_too_high = latest_temperature > temp_slider[1]
-                if (temp_too_low or temp_too_high) and not st.session_state.get(
-                    "temp_alert_send", False
-                ):
-                    send_push(
-                        title=f"{'Low' if temp_too_low else 'High'} Temperature Alert",
-                        body=f"⚠️ Current Temperature is {latest_temperature} °C",
-                        sound_path=(sound_path if enable_sound else None),
-                    )
-                    st.session_state["temp_alert_send"] = True
-                else:
-                    st.session_state["temp_alert_send"] = False
-
-                humi_too_low = latest_humidity < humid_slider[0]
-                humi_too_high = latest_humidity > humid_slider[1]
-                if (humi_too_low or humi_too_high) and not st.session_state.get(
-                    "humid_alert_send", False
-                ):
-                    # send_alert(
-                    #     message=f"⚠️ Humidity is {latest_humidity} %",
-                    # )
-                    send_push(
-                        title=f"{'Low' if temp_too_low else 'High'} Humidity Alert",
-                        body=f"⚠️ Humidity is {latest_humidity} %",
-                        sound_path=(sound_path if enable_sound else None),
-                    )
-                    st.session_state["humid_alert_send"] = True
-                else:
-                    st.session_state["humid_alert_send"] = False
-
-            metric_cols = st.columns(2)
-            mean_temp = df["temperature"].mean()
-            delta_temp = latest_temperature - mean_temp
-            delta_color = "off"
-            delta_temp = round(delta_temp, 1)
-            metric_cols[0].metric(
-                "Live Temperature",
-                f"{latest_temperature:.1f} °C",
-                f"{delta_temp:.1f} °C",
-                delta_color,
-                help=f"Temperature in Celsius compared to the average temperature in the last {date_range}.",
+        if view_mode == "Heatmap":
+            # hourly means from the shared cube instead of the minutes
+            heatmap = get_pipeline(location).heatmap(spec)
+            instrumentation.count("chart_rows", len(heatmap))
+            chart = build_heatmap_chart(heatmap)
+        elif view_mode == "Calendar":
+            calendar = get_pipeline(location).calendar(spec)
+            instrumentation.count("chart_rows", len(calendar))
+            chart = build_calendar_chart(calendar)
+        else:
+            chart_data = view.chart_data
+            if not display_sunrise_sunset:
+                chart_data = chart_data.drop(columns=sunrise_sunset_columns)
+            instrumentation.count("chart_rows", len(chart_data))
+            chart = build_measurement_chart(
+                chart_data,
+                rolling_average_display,
+                display_temperature=display_temperature,
+                display_humidity=display_humidity,
+                display_temperature_mean=display_temperature_mean,
+                display_humidity_mean=display_humidity_mean,
+                display_sunrise_sunset=display_sunrise_sunset,
             )
 
-            mean_humidity = df["humidity"].mean()
-            delta_humidity = latest_humidity - mean_humidity
-            delta_color = "inverse"
-            delta_humidity = round(delta_humidity, 1)
-            metric_cols[1].metric(
-                "Live Humidity",
-                f"{latest_humidity:.1f} %",
-                f"{delta_humidity:.1f} %",
-                delta_color,
-                help=f"Humidity compared to the average humidity in the last {date_range}.",
-            )
+        # includes the altair serialization
+        with instrumentation.span("altair_chart"):
+            st.altair_chart(chart, use_container_width=True)
 
-            # get the earliest sunrise and latest sunset
-            df_sunrise_sunset = get_sunrise_sunset_data(
-                date_start=from_date.strftime("%Y-%m-%d"),
-                date_end=to_date.strftime("%Y-%m-%d"),
-            )
+        st.subheader("Statistics", divider=True)
+        general_cols = st.columns(3)
+        general_cols[0].metric("Measurements", stats["count"])
+        general_cols[1].metric(
+            "First Measurements (UTC)",
+            stats["first"].strftime("%H:%M %d/%m"),
+        )
+        general_cols[2].metric(
+            "Latest Measurements (UTC)",
+            stats["last"].strftime("%H:%M %d/%m"),
+        )
 
-            # find the closest measuremet in df to sunrise and sunset and set them to 1
-            # else set them to 0
-            df["sunrise_sunset"] = 0
-            for index, row in df_sunrise_sunset.iterrows():
-                sunrise = row["sunrise"]
-                sunset = row["sunset"]
-                df.loc[
-                    (df["created_at"] - sunrise).abs().idxmin(),
-                    ["sunrise_sunset", "sunrise_sunset_type"],
-                ] = [1, "Sunrise"]
-                df.loc[
-                    (df["created_at"] - sunset).abs().idxmin(),
-                    ["sunrise_sunset", "sunrise_sunset_type"],
-                ] = [1, "Sunset"]
-            # remove the first sunset, sunrise indicators from the measurement
-            # sunrise_sunset column as they are not accurate
-            df["sunrise_sunset"] = df["sunrise_sunset"].shift(-1)
-            df["sunrise_sunset_type"] = df["sunrise_sunset_type"].shift(-1)
-
-            base = alt.Chart(df).encode(x=alt.X("created_at:T", title=""))
-
-            # show vertical lines for sunrise and sunset times, i.e. when sunrise and sunset are 1
-            sunrise_sunset = (
-                base.mark_rule(strokeDash=[5, 5])
-                .encode(
-                    x="created_at:T",
-                    color=alt.Color(
-                        "sunrise_sunset_type:N",
-                        scale=alt.Scale(range=["orange", "purple"]),
-                        legend=None,
-                    ),
-                    tooltip=[
-                        alt.Tooltip("sunrise_sunset_type:N", title="Event"),
-                        alt.Tooltip(
-                            "created_at:T", title="Time", format="%Y-%m-%d %H:%M"
-                        ),
-                    ],
-                )
-                .transform_filter("datum.sunrise_sunset == 1")
-            )
-            # make the vertical lines into arrows for sunrise and sunset times
-            sunrise_sunset = sunrise_sunset.transform_calculate(
-                y="datum.sunrise_sunset_type == 'Sunrise' ? 0 : 400"
-            )
+        temp_cols = st.columns(3)
+        temp_cols[0].metric(
+            "Average Temperature", f"{stats['temperature_mean']:.1f}°C"
+        )
+        temp_cols[1].metric(
+            "Maximum Temperature", f"{stats['temperature_max']:.1f} °C"
+        )
+        temp_cols[2].metric(
+            "Minimum Temperature", f"{stats['temperature_min']:.1f} °C"
+        )
+        temp_spread_cols = st.columns(3)
+        temp_spread_cols[0].metric(
+            "Temperature Std. Dev.", f"{stats['temperature_std']:.1f} °C"
+        )
+        temp_spread_cols[1].metric(
+            "Median Temperature", f"{stats['temperature_p50']:.1f} °C"
+        )
+        temp_spread_cols[2].metric(
+            "Temperature 5th-95th Pct.",
+            f"{stats['temperature_p5']:.1f} - {stats['temperature_p95']:.1f} °C",
+        )
+        humi_cols = st.columns(3)
+        humi_cols[0].metric(
+            "Average Humidity (%)", f"{stats['humidity_mean']:.1f} %"
+        )
+        humi_cols[1].metric(
+            "Maximum Humidity (%)", f"{stats['humidity_max']:.1f} %"
+        )
+        humi_cols[2].metric(
+            "Minimum Humidity (%)", f"{stats['humidity_min']:.1f} %"
+        )
+        humi_spread_cols = st.columns(3)
+        humi_spread_cols[0].metric(
+            "Humidity Std. Dev.", f"{stats['humidity_std']:.1f} %"
+        )
+        humi_spread_cols[1].metric(
+            "Median Humidity (%)", f"{stats['humidity_p50']:.1f} %"
+        )
+        humi_spread_cols[2].metric(
+            "Humidity 5th-95th Pct.",
+            f"{stats['humidity_p5']:.1f} - {stats['humidity_p95']:.1f} %",
+        )
 
-            hover = alt.selection_point(
-                fields=["created_at"],
-                nearest=True,
-                on="mouseover",
-                empty="none",
-                clear="mouseout",
-            )
+        with st.expander("Raw Data", expanded=False):
+            st.header("Measurements")
+            render_raw_data(df, key=f"raw_data_page_{date_range}")
+            st.header("Sunrise & Sunset")
+            st.write(view.sunrise_sunset)
+
+
+def map_concurrently(func, items: list) -> list:
+    # the streamlit caches need the script run context in the worker threads
+    ctx = get_script_run_ctx()
+    profile = instrumentation.current_profile.get()
+
+    def initializer():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        instrumentation.current_profile.set(profile)
+
+    with ThreadPoolExecutor(
+        max_workers=max(len(items), 1), initializer=initializer
+    ) as pool:
+        return list(pool.map(func, items))
+
+
+@st.fragment(run_every=live_run_every)
+@profiled
+def render_comparison(compared_locations: list, date_range: str):
+    if not compared_locations:
+        st.info("Select the locations to compare.")
+        return
+
+    hours, rolling_average, _ = date_range_settings[date_range]
+    to_dates = map_concurrently(get_last_timestamp, compared_locations)
+    to_dates = [t for t in to_dates if t is not None]
+    if not to_dates:
+        st.info("No measurements of the selected locations yet.")
+        return
+    to_date = max(to_dates)
+    from_date = get_from_date(hours, to_date)
+    spec = make_range_spec(
+        from_date, to_date, rolling_average, max_points=max_chart_points
+    )
 
-            # Create a line for temperature
-            min_temp_scale = df["temperature"].min() - 2
-            max_temp_scale = df["temperature"].max() + 2
-            temperature_axis = alt.Axis(titleColor="red", title="Temperature (°C)")
-            temperature_scale = alt.Scale(domain=[min_temp_scale, max_temp_scale])
-            temperature_line = base.mark_line(
-                color="red", interpolate="monotone"
-            ).encode(
+    # fetch all locations at the same time
+    with instrumentation.span("fetch_resampled"):
+        frames = map_concurrently(
+            lambda l: get_pipeline(l).fetch_resampled(spec), compared_locations
+        )
+    # on the rollup resolutions, the minimum and maximum are taken from the
+    # extremes of the buckets instead of their means
+    columns = ["temperature", "humidity"]
+    if spec.resolution == "1min":
+        extremes = {(c, s): c for c in columns for s in ["min", "max"]}
+        value_columns = columns
+    else:
+        extremes = {(c, s): f"{c}_{s}" for c in columns for s in ["min", "max"]}
+        value_columns = [*columns, *extremes.values()]
+    # align all locations on the common time grid in a single outer join
+    df = pd.concat(
+        {
+            l: frame.set_index("created_at")[value_columns]
+            for l, frame in zip(compared_locations, frames)
+        },
+        axis=1,
+        names=["location"],
+    )
+    df = df[df.index >= spec.from_date]
+    df = df.stack(level="location", future_stack=True).reset_index()
+    df["location"] = df["location"].astype("category")
+
+    base = alt.Chart(df[["created_at", "location", *columns]]).encode(
+        x=alt.X("created_at:T", title=""),
+        color=alt.Color("location:N", title="Location"),
+        tooltip=[
+            alt.Tooltip("created_at:T", title="Time", format="%Y-%m-%d %H:%M"),
+            alt.Tooltip("location:N", title="Location"),
+            alt.Tooltip("temperature:Q", title="Temperature (°C)", format=".1f"),
+            alt.Tooltip("humidity:Q", title="Humidity (%)", format=".1f"),
+        ],
+    )
+    layers = []
+    if display_temperature:
+        layers.append(
+            base.mark_line(interpolate="monotone").encode(
                 y=alt.Y(
                     "temperature:Q",
-                    axis=temperature_axis,
-                    scale=temperature_scale,
+                    axis=alt.Axis(title="Temperature (°C)"),
+                    scale=alt.Scale(zero=False),
                 )
             )
-
-            rolling_average_temperature_line = base.mark_line(
-                color="salmon", interpolate="monotone"
-            ).encode(
-                y=alt.Y(
-                    "temperature_mean:Q",
-                    axis=temperature_axis,
-                    scale=temperature_scale,
-                )
-            )
-            if display_temperature and not display_temperature_mean:
-                temperature_line = temperature_line
-            elif display_temperature and display_temperature_mean:
-                temperature_line = temperature_line + rolling_average_temperature_line
-            elif not display_temperature and display_temperature_mean:
-                temperature_line = rolling_average_temperature_line
-
-            # Create a line for humidity with a secondary y-axis
-            min_humidity_scale = df["humidity"].min() - 5
-            max_humidity_scale = df["humidity"].max() + 5
-            humidity_axis = alt.Axis(titleColor="blue", title="Humidity (%)")
-            humidity_scale = alt.Scale(domain=[min_humidity_scale, max_humidity_scale])
-            humidity_line = base.mark_line(color="blue", interpolate="monotone").encode(
+        )
+    if display_humidity:
+        layers.append(
+            base.mark_line(interpolate="monotone", strokeDash=[5, 5]).encode(
                 y=alt.Y(
                     "humidity:Q",
-                    axis=humidity_axis,
-                    scale=humidity_scale,
-                ),
-            )
-
-            rolling_average_humidity_line = base.mark_line(
-                color="lightblue", interpolate="monotone"
-            ).encode(
-                y=alt.Y(
-                    "humidity_mean:Q",
-                    axis=humidity_axis,
-                    scale=humidity_scale,
-                ),
-            )
-            if display_humidity and not display_humidity_mean:
-                humidity_line = humidity_line
-            elif display_humidity and display_humidity_mean:
-                humidity_line = humidity_line + rolling_average_humidity_line
-            elif not display_humidity and display_humidity_mean:
-                humidity_line = rolling_average_humidity_line
-
-            # hover_line = (
-            #     base.mark_rule(color="gray", strokeDash=[5, 5])
-            #     .encode(opacity=alt.condition(hover, alt.value(1), alt.value(0)))
-            #     .add_params(hover)
-            # )
-
-            # Points to show nearest values on hover for temperature and humidity
-            # temperature_points = (
-            #     base.mark_circle(color="red", size=50)
-            #     .encode(
-            #         y="temperature:Q",
-            #         opacity=alt.condition(hover, alt.value(1), alt.value(0)),
-            #     )
-            #     .transform_filter(hover)
-            # )
-
-            # humidity_points = (
-            #     base.mark_circle(color="blue")
-            #     .encode(y="humidity:Q", opacity=alt.condition(hover, alt.value(1), alt.value(0)))
-            #     .transform_filter(hover)
-            # )
-
-            # Tooltip to display temperature and humidity values on hover
-            tooltips = (
-                base.mark_rule()
-                .encode(
-                    opacity=alt.condition(hover, alt.value(0.1), alt.value(0)),
-                    tooltip=[
-                        alt.Tooltip(
-                            "created_at:T", title="Time", format="%Y-%m-%d %H:%M"
-                        ),
-                        alt.Tooltip("temperature:Q", title="Temperature (°C)"),
-                        alt.Tooltip(
-                            "temperature_mean:Q",
-                            title=f"Rolling {rolling_average_display} Temperature (°C)",
-                        ),
-                        alt.Tooltip("humidity:Q", title="Humidity (%)"),
-                        alt.Tooltip(
-                            "humidity_mean:Q",
-                            title=f"Rolling  {rolling_average_display} Humidity (%)",
-                        ),
-                    ],
+                    axis=alt.Axis(title="Humidity (%)"),
+                    scale=alt.Scale(zero=False),
                 )
-                .add_params(hover)
             )
+        )
+    if layers:
+        chart = (
+            alt.layer(*layers)
+            .resolve_scale(y="independent")
+            .properties(width=600, height=400, title="")
+        )
+        with instrumentation.span("altair_chart"):
+            st.altair_chart(chart, use_container_width=True)
+        st.caption("Solid lines show the temperature, dashed lines the humidity.")
+
+    st.subheader("Statistics", divider=True)
+    stats = df.groupby("location", observed=True).agg(
+        **{
+            "Average Temperature (°C)": ("temperature", "mean"),
+            "Minimum Temperature (°C)": (extremes["temperature", "min"], "min"),
+            "Maximum Temperature (°C)": (extremes["temperature", "max"], "max"),
+            "Average Humidity (%)": ("humidity", "mean"),
+            "Minimum Humidity (%)": (extremes["humidity", "min"], "min"),
+            "Maximum Humidity (%)": (extremes["humidity", "max"], "max"),
+        }
+    )
+    # the latest readings instead of the last buckets
+    measurements = {l: get_measurement_store(l).df for l in stats.index}
+    stats.insert(
+        0,
+        "Latest Temperature (°C)",
+        [last_valid(measurements[l]["temperature"]) for l in stats.index],
+    )
+    stats.insert(
+        4,
+        "Latest Humidity (%)",
+        [last_valid(measurements[l]["humidity"]) for l in stats.index],
+    )
+    st.dataframe(stats.round(1))
 
-            # Layer all elements
-            layers = []
-            if display_temperature or display_temperature_mean:
-                layers.append(temperature_line)
-            if display_humidity or display_humidity_mean:
-                layers.append(humidity_line)
-            if display_temperature or display_humidity:
-                layers.append(tooltips)
-            if display_sunrise_sunset:
-                layers.append(sunrise_sunset)
-            chart = (
-                alt.layer(*layers)
-                .resolve_scale(y="independent")
-                .properties(width=600, height=400, title="")
-            )
 
-            st.altair_chart(chart, use_container_width=True)
+if compare_mode:
+    selected_date_range = st.segmented_control(
+        "Date Range",
+        list(date_range_settings),
+        default="1h",
+        label_visibility="collapsed",
+    )
+    render_comparison(compared_locations, selected_date_range or "1h")
+elif enable_lazy_loading:
+    # only fetch and render the selected date range
+    selected_date_range = st.segmented_control(
+        "Date Range",
+        date_ranges,
+        default=date_ranges[0],
+        label_visibility="collapsed",
+    )
+    # segmented control returns None when the selection is cleared
+    render_date_range(selected_date_range or date_ranges[0])
+else:
+    tabs = st.tabs(date_ranges)
+    for tab, date_range in zip(tabs, date_ranges):
+        with tab:
+            render_date_range(date_range)
+
+
+@st.fragment
+@profiled
+def render_export():
+    export_locations = st.multiselect(
+        "Locations", locations, default=displayed_locations, key="export_locations"
+    )
+    date_cols = st.columns(2)
+    today = pd.Timestamp.utcnow().date()
+    date_from = date_cols[0].date_input(
+        "From Date",
+        today - pd.Timedelta(days=7),
+        format="DD/MM/YYYY",
+        key="export_from",
+    )
+    date_to = date_cols[1].date_input(
+        "To Date", today, format="DD/MM/YYYY", key="export_to"
+    )
+    option_cols = st.columns(2)
+    resolution = option_cols[0].selectbox(
+        "Resolution",
+        export_resolutions,
+        help="Raw measurements or min/mean/max aggregates per bucket.",
+        key="export_resolution",
+    )
+    export_format = option_cols[1].selectbox(
+        "Format", list(export_formats), key="export_format"
+    )
 
-            num_measurements = len(df)
-            st.subheader("Statistics", divider=True)
-            general_cols = st.columns(3)
-            general_cols[0].metric("Measurements", num_measurements)
-            general_cols[1].metric(
-                "First Measurements (UTC)",
-                df["created_at"].min().strftime("%H:%M %d/%m"),
-            )
-            general_cols[2].metric(
-                "Latest Measurements (UTC)",
-                df["created_at"].max().strftime("%H:%M %d/%m"),
+    # full days in UTC, the to date is included
+    from_date = pd.Timestamp(date_from)
+    to_date = pd.Timestamp(date_to) + pd.Timedelta(days=1)
+    params = (tuple(export_locations), from_date, to_date, resolution, export_format)
+    if st.button(
+        "Prepare Download",
+        disabled=not export_locations or from_date >= to_date,
+        key="export_prepare",
+    ):
+        with st.spinner("Preparing download..."):
+            data = export_measurements(
+                {l: get_measurement_store(l) for l in export_locations},
+                from_date,
+                to_date,
+                resolution,
+                export_format,
             )
+        st.session_state["export"] = (params, data)
+
+    # the prepared file is kept until the parameters change
+    export = st.session_state.get("export")
+    if export is not None and export[0] == params:
+        mime, extension = export_formats[export_format]
+        st.download_button(
+            f"Download ({len(export[1]) / 1e6:.1f} MB)",
+            export[1],
+            file_name=(
+                f"measurements_{'_'.join(export_locations)}_{resolution}_"
+                f"{date_from}_{date_to}.{extension}"
+            ),
+            mime=mime,
+            on_click="ignore",
+            icon=":material/download:",
+        )
 
-            temp_cols = st.columns(3)
-            temp_cols[0].metric(
-                "Average Temperature", f"{df['temperature'].mean():.1f}°C"
-            )
-            temp_cols[1].metric("Maximum Temperature", f"{df['temperature'].max():.1f} °C")
-            temp_cols[2].metric("Minimum Temperature", f"{df['temperature'].min():.1f} °C")
-            humi_cols = st.columns(3)
-            humi_cols[0].metric(
-                "Average Humidity (%)", f"{df['humidity'].mean():.1f} %"
-            )
-            humi_cols[1].metric("Maximum Humidity (%)", f"{df['humidity'].max():.1f} %")
-            humi_cols[2].metric("Minimum Humidity (%)", f"{df['humidity'].min():.1f} %")
-
-            with st.expander("Raw Data", expanded=False):
-                st.header("Measurements")
-                st.write(df)
-                st.header("Sunrise & Sunset")
-                st.write(df_sunrise_sunset)
-if auto_refresh:
+
+with st.expander("Export", expanded=False):
+    render_export()
+
+if auto_refresh and not live_updates:
     # refresh every 60 seconds
     st_autorefresh(interval=refresh_interval * 1000, key="autorefresh")
+
+finish_run_profile(script_profile)
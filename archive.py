@@ -0,0 +1,127 @@
+import argparse
+import os
+
+import pandas as pd
+
+import instrumentation
+from measurement_store import empty_measurements, fetch_measurements, to_utc
+
+
+# cold tier of the measurements, one parquet file per location and month in
+# hive-style partitions (location=<location>/month=<YYYY-MM>/part.parquet).
+# only complete months are archived and the archive always starts at the
+# beginning of the recording, so everything before archived_until is local.
+class MeasurementArchive:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, location: str, month: pd.Period) -> str:
+        return os.path.join(
+            self.directory, f"location={location}", f"month={month}", "part.parquet"
+        )
+
+    def locations(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name.removeprefix("location=")
+            for name in os.listdir(self.directory)
+            if name.startswith("location=")
+        )
+
+    def months(self, location: str) -> list:
+        directory = os.path.join(self.directory, f"location={location}")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            pd.Period(name.removeprefix("month="), freq="M")
+            for name in os.listdir(directory)
+            if os.path.exists(os.path.join(directory, name, "part.parquet"))
+        )
+
+    def archived_until(self, location: str):
+        months = self.months(location)
+        if not months:
+            return None
+        return (months[-1] + 1).start_time.tz_localize("UTC")
+
+    def read(self, location: str, from_date=None, before=None) -> pd.DataFrame:
+        # only the partitions of the months overlapping [from_date, before) are
+        # read
+        months = self.months(location)
+        if from_date is not None:
+            from_date = to_utc(from_date)
+            months = [m for m in months if m.end_time.tz_localize("UTC") >= from_date]
+        if before is not None:
+            before = to_utc(before)
+            months = [m for m in months if m.start_time.tz_localize("UTC") < before]
+        if not months:
+            return empty_measurements()
+        with instrumentation.span("archive.read"):
+            df = pd.concat(
+                [pd.read_parquet(self.path(location, month)) for month in months],
+                ignore_index=True,
+            )
+        instrumentation.count("archive_rows_read", len(df))
+        mask = pd.Series(True, index=df.index)
+        if from_date is not None:
+            mask &= df["created_at"] >= from_date
+        if before is not None:
+            mask &= df["created_at"] < before
+        return df.loc[mask].reset_index(drop=True)
+
+    def latest(self, location: str) -> pd.DataFrame:
+        for month in reversed(self.months(location)):
+            df = pd.read_parquet(self.path(location, month))
+            if not df.empty:
+                return df.iloc[-1:].reset_index(drop=True)
+        return empty_measurements()
+
+    def write(self, location: str, month: pd.Period, df: pd.DataFrame):
+        # df has to contain all measurements of the month. months without
+        # measurements are written as empty partitions, so that archived_until
+        # keeps advancing.
+        path = self.path(location, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so readers never see partial files
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+
+
+def archive_measurements(client, directory: str, since: str):
+    archive = MeasurementArchive(directory)
+    locations = client.table("locations").select("location").execute().data
+    # only complete months are archived
+    current_month = pd.Timestamp.utcnow().tz_localize(None).to_period("M")
+    for location in [l["location"] for l in locations]:
+        from_date = archive.archived_until(location) or to_utc(since)
+        first_month = from_date.tz_localize(None).to_period("M")
+        # one month at a time to bound memory
+        for month in pd.period_range(first_month, current_month - 1, freq="M"):
+            df = fetch_measurements(
+                client,
+                location,
+                from_date=month.start_time,
+                before=(month + 1).start_time,
+            )
+            archive.write(location, month, df)
+            print(f"{location}: archived {len(df)} measurements of {month}")
+
+
+if __name__ == "__main__":
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(
+        description="Archive the complete months of all locations as parquet."
+    )
+    parser.add_argument("--directory", default="archive")
+    parser.add_argument(
+        "--since",
+        default="2024-11-12",
+        help="Start of the recording, used when nothing is archived yet.",
+    )
+    args = parser.parse_args()
+
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    archive_measurements(client, args.directory, args.since)
@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+import time
+import warnings
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from charts import (
+    build_calendar_chart,
+    build_heatmap_chart,
+    build_measurement_chart,
+    prepare_chart_data,
+)
+from cleaning import gap_threshold, split_segments
+from cube import HourlyCube
+from processing import add_sunrise_sunset_markers
+from rollups import compute_rollup, pick_resolution, resolutions
+
+# range -> days of minutely data and rolling average in minutes
+date_ranges = {
+    "1h": (1 / 24, 5),
+    "6h": (6 / 24, 60),
+    "24h": (1, 360),
+    "7d": (7, 1440),
+    "30d": (30, 10080),
+    "Max": (365, 10080),
+}
+
+
+def make_data(days: float) -> pd.DataFrame:
+    n = int(days * 1440)
+    created_at = pd.date_range("2024-11-12", periods=n, freq="1min", tz="UTC")
+    phase = np.arange(n) / 1440 * 2 * np.pi
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "created_at": created_at,
+            "temperature": 20 + 2 * np.sin(phase) + rng.normal(0, 0.3, n),
+            "humidity": 50 + 8 * np.cos(phase) + rng.normal(0, 1, n),
+            # extra columns of the select("*") rows
+            "id": np.arange(n),
+            "location": "living",
+        }
+    )
+
+
+def add_rolling_means(df: pd.DataFrame, window: int) -> pd.DataFrame:
+    for column in ["temperature", "humidity"]:
+        df[f"{column}_mean"] = (
+            df[column].rolling(window=window, min_periods=window // 2).mean()
+        )
+    return df
+
+
+def add_markers(df: pd.DataFrame) -> pd.DataFrame:
+    days = df["created_at"].dt.floor("1D").unique()
+    df_sunrise_sunset = pd.DataFrame(
+        {
+            "sunrise": days + pd.Timedelta(hours=7),
+            "sunset": days + pd.Timedelta(hours=17),
+        }
+    )
+    return add_sunrise_sunset_markers(df, df_sunrise_sunset)
+
+
+def measure(df: pd.DataFrame, rolling_average_display: str, build_chart=None):
+    start = time.perf_counter()
+    if build_chart is None:
+        chart = build_measurement_chart(
+            df, rolling_average_display, display_sunrise_sunset=True
+        )
+    else:
+        chart = build_chart(df)
+    spec = json.dumps(chart.to_dict())
+    return len(spec), (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    # streamlit sends the data itself, so the altair row limit does not apply
+    alt.data_transformers.disable_max_rows()
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    print(f"{'range':>5} {'rows':>8} {'before':>18} {'rows':>6} {'after':>18}")
+    for date_range, (days, rolling_average) in date_ranges.items():
+        raw = make_data(days)
+
+        # before: every minute with all columns in the spec
+        before = add_markers(add_rolling_means(raw.copy(), rolling_average))
+        before_size, before_ms = measure(before, "")
+
+        # after: resolution picked by the dashboard, pruned columns and lttb
+        resolution = pick_resolution(
+            raw["created_at"].iloc[0], raw["created_at"].iloc[-1]
+        )
+        if resolution == "1min":
+            after = raw.copy()
+        else:
+            after = compute_rollup(raw, resolution)
+        window = max(1, rolling_average // resolutions[resolution])
+        after = split_segments(
+            add_rolling_means(after, window),
+            max(gap_threshold, pd.Timedelta(minutes=resolutions[resolution])),
+        )
+        after = add_markers(after)
+        after = prepare_chart_data(after, max_points=1000)
+        after_size, after_ms = measure(after, "")
+
+        print(
+            f"{date_range:>5} {len(before):>8} "
+            f"{before_size / 1e6:>7.2f} MB {before_ms:>6.0f} ms "
+            f"{len(after):>6} {after_size / 1e6:>7.2f} MB {after_ms:>6.0f} ms"
+        )
+
+    # the views of the Max range computed from the hourly cube
+    cube = HourlyCube()
+    cube.update(compute_rollup(raw, "1h"))
+    from_date, to_date = raw["created_at"].iloc[0], raw["created_at"].iloc[-1]
+    for name, df, build_chart in [
+        ("heatmap", cube.heatmap(from_date, to_date), build_heatmap_chart),
+        ("calendar", cube.calendar(from_date, to_date), build_calendar_chart),
+    ]:
+        size, ms = measure(df, "", build_chart)
+        print(
+            f"{'Max':>5} {name:>8} {len(df):>6} cells "
+            f"{size / 1e6:>7.2f} MB {ms:>6.0f} ms"
+        )
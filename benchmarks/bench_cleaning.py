@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cleaning import gap_threshold, reject_outliers, split_segments
+from measurement_store import compact_measurements, measurement_columns
+from synthetic import generate_measurements
+
+# glitch kind -> column it corrupts
+glitch_columns = {"spike": "temperature", "stuck": "humidity"}
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def detection(raw: pd.DataFrame, cleaned: pd.DataFrame):
+    # rejected readings compared to the injected spikes and stuck readings
+    for kind, column in glitch_columns.items():
+        truth = (raw["glitch"] == kind).to_numpy()
+        rejected = (raw[column].notna() & cleaned[column].isna()).to_numpy()
+        hits = (truth & rejected).sum()
+        print(
+            f"{column:>12}: {truth.sum()} {kind} glitches, {rejected.sum()} "
+            f"rejected, recall {hits / max(truth.sum(), 1):.3f}, "
+            f"precision {hits / max(rejected.sum(), 1):.3f}"
+        )
+        print(
+            f"{'':>12}  range {raw[column].min():.1f} - {raw[column].max():.1f} "
+            f"before, {cleaned[column].min():.1f} - {cleaned[column].max():.1f} after"
+        )
+
+
+def incremental(raw: pd.DataFrame, batch_size: int):
+    # rows arriving in batches like the polls of the measurement store, each
+    # batch is cleaned with the cleaned rows before it as context
+    frames = [reject_outliers(raw.iloc[:batch_size])]
+    durations = []
+    for start in range(batch_size, len(raw), batch_size):
+        batch, ms = timed(
+            reject_outliers, raw.iloc[start : start + batch_size], context=frames[-1]
+        )
+        frames.append(batch)
+        durations.append(ms)
+    return pd.concat(frames, ignore_index=True), np.array(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Outlier rejection and gap segmentation on synthetic data."
+    )
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--incremental-days", type=int, default=30)
+    args = parser.parse_args()
+
+    data = generate_measurements(args.days)
+    raw = compact_measurements(data[measurement_columns])
+    print(f"{args.days} days, {len(raw)} readings")
+
+    cleaned, ms = timed(reject_outliers, raw)
+    print(f"reject_outliers: {ms:.0f} ms, {len(raw) / ms * 1000 / 1e6:.1f} M rows/s")
+    detection(data, cleaned)
+
+    # the 1 minute grid of the chart, with the missing minutes of the outages
+    grid = cleaned.resample("1min", on="created_at").last().reset_index()
+    segmented, ms = timed(split_segments, grid, gap_threshold)
+    print(
+        f"split_segments: {ms:.0f} ms, {len(grid)} minutes, "
+        f"{len(grid) - len(segmented)} empty minutes dropped, "
+        f"{segmented['segment'].iloc[-1] + 1} segments"
+    )
+
+    # only the last days, the batches are independent of the length of the
+    # recording
+    recent = raw.iloc[-args.incremental_days * 1440 :].reset_index(drop=True)
+    streamed, durations = incremental(recent, args.batch_size)
+    batch = reject_outliers(recent)
+    agreement = (
+        (streamed[["temperature", "humidity"]].isna())
+        == (batch[["temperature", "humidity"]].isna())
+    ).to_numpy().mean()
+    print(
+        f"incremental: {len(durations)} batches of {args.batch_size} rows, "
+        f"median {np.median(durations):.2f} ms, p95 "
+        f"{np.percentile(durations, 95):.2f} ms, {agreement:.5f} of the "
+        f"rejections agree with a single pass"
+    )
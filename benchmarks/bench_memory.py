@@ -0,0 +1,121 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import sunrise_sunset
+from fake_supabase import FakeSupabaseClient, fake_sunrise_sunset_get
+from measurement_store import MeasurementStore
+from pipeline import LocationPipeline, make_range_spec
+from rollups import RollupStore
+from synthetic import generate_measurements
+
+start_of_recording_date = "2024-11-12"
+location = "living"
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def cache_sizes(pipeline: LocationPipeline) -> dict:
+    # bytes held by the long-lived caches of a location
+    rolling_means = pipeline.rolling_means
+    histograms = [
+        summary[column]["histogram"]
+        for summary in pipeline.statistics_index.days.values()
+        for column in ["temperature", "humidity"]
+    ]
+    return {
+        "measurement store": frame_bytes(pipeline.store.df),
+        "rollups": sum(
+            frame_bytes(rollup) for _, rollup in pipeline.rollup_store.rollups.values()
+        ),
+        "rolling means": sum(
+            buffer.values.nbytes
+            for buffers in [
+                rolling_means.values,
+                rolling_means.sums,
+                rolling_means.counts,
+            ]
+            for buffer in buffers.values()
+        ),
+        "statistics index": sum(histogram.nbytes for histogram in histograms),
+        "views": sum(
+            frame_bytes(view.df) + frame_bytes(view.chart_data)
+            for view in pipeline.views.values()
+        ),
+    }
+
+
+def measure(client, with_rollups: bool):
+    with tempfile.TemporaryDirectory() as rollups_dir:
+        if with_rollups:
+            # the rollup job has run up to the start of the last day
+            job_store = MeasurementStore(client, location)
+            job_store.refresh()
+            last_day = job_store.last_timestamp.floor("1D")
+            RollupStore(rollups_dir, location).update(
+                job_store.get(start_of_recording_date, last_day - pd.Timedelta("1ns"))
+            )
+            del job_store
+            gc.collect()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        pipeline = LocationPipeline(
+            MeasurementStore(client, location, refresh_interval=0),
+            RollupStore(rollups_dir, location),
+            lambda date_start, date_end: sunrise_sunset.get_sunrise_sunset_data(
+                date_start, date_end, lat=49.88, lon=8.67
+            ),
+            chart_points=1000,
+        )
+        pipeline.store.refresh()
+        to_date = pipeline.store.last_timestamp
+        # 24h fills the rolling means, Max the rollups and the statistics index
+        for hours, rolling_average in [(24, 360), (None, 10080)]:
+            from_date = (
+                start_of_recording_date
+                if hours is None
+                else to_date - pd.Timedelta(hours=hours)
+            )
+            pipeline.view(
+                make_range_spec(from_date, to_date, rolling_average, max_points=2000)
+            )
+        duration = time.perf_counter() - start
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        sizes = cache_sizes(pipeline)
+
+    print(f"{'with' if with_rollups else 'without'} rollup files, {duration:.1f} s")
+    for name, size in sizes.items():
+        print(f"{name:>18} {size / 1e6:>8.2f} MB")
+    print(f"{'total':>18} {sum(sizes.values()) / 1e6:>8.2f} MB")
+    print(f"{'traced current':>18} {current / 1e6:>8.2f} MB")
+    print(f"{'traced peak':>18} {peak / 1e6:>8.2f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Memory held by the caches of a location after the Max range."
+    )
+    parser.add_argument("--days", type=int, default=3 * 365)
+    args = parser.parse_args()
+
+    client = FakeSupabaseClient(generate_measurements(args.days, location=location))
+    gc.collect()
+    print(f"{args.days} days of measurements")
+    # no network: the sunrise api is answered locally
+    with mock.patch.object(sunrise_sunset.requests, "get", fake_sunrise_sunset_get):
+        for with_rollups in [True, False]:
+            measure(client, with_rollups)
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import warnings
+from unittest import mock
+
+import altair as alt
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import instrumentation
+import sunrise_sunset
+from charts import build_measurement_chart
+from fake_supabase import FakeSupabaseClient, fake_sunrise_sunset_get
+from measurement_store import MeasurementStore
+from pipeline import LocationPipeline, make_range_spec
+from rollups import RollupStore
+from synthetic import generate_measurements
+
+# dataset name -> days of minutely data
+datasets = {"1d": 1, "30d": 30, "1y": 365, "3y": 3 * 365}
+# range -> hours and rolling average in minutes, as in the dashboard
+date_ranges = {
+    "1h": (1, 5),
+    "6h": (6, 60),
+    "24h": (24, 360),
+    "7d": (24 * 7, 1440),
+    "30d": (24 * 30, 10080),
+    "Max": (None, 10080),
+}
+start_of_recording_date = "2024-11-12"
+location = "living"
+# a stage counts as regressed if it is this much slower than the baseline, and
+# by more than min_regression_ms so that noise of fast stages is ignored
+regression_threshold = 1.25
+min_regression_ms = 5
+
+
+def render(pipeline: LocationPipeline, hours, rolling_average: int):
+    # the stages of render_date_range, without streamlit
+    pipeline.store.refresh(force=True)
+    to_date = pipeline.store.last_timestamp
+    if hours is None:
+        from_date = start_of_recording_date
+    else:
+        from_date = to_date - pd.Timedelta(hours=hours)
+    spec = make_range_spec(from_date, to_date, rolling_average, max_points=2000)
+    # time the computation, not the shared view of the previous run
+    pipeline.views.clear()
+    view = pipeline.view(spec)
+
+    with instrumentation.span("chart_spec"):
+        chart = build_measurement_chart(
+            view.chart_data, "", display_sunrise_sunset=True
+        )
+        chart_spec = json.dumps(chart.to_dict())
+    instrumentation.count("chart_spec_bytes", len(chart_spec))
+
+
+def get_sunrise_sunset(date_start: str, date_end: str) -> pd.DataFrame:
+    return sunrise_sunset.get_sunrise_sunset_data(
+        date_start, date_end, lat=49.88, lon=8.67
+    )
+
+
+def run_dataset(name: str, days: int, repeat: int) -> dict:
+    # the first render of each range is cold (nothing cached yet), the warm
+    # time is the best of repeat renders with all caches filled
+    results = {}
+    raw = generate_measurements(
+        days, location=location, start=start_of_recording_date
+    )
+    client = FakeSupabaseClient(raw)
+    with tempfile.TemporaryDirectory() as rollups_dir:
+        # the rollup job has run up to the start of the last day
+        rollup_store = RollupStore(rollups_dir, location)
+        last_day = raw["created_at"].iloc[-1].floor("1D")
+        rollup_store.update(raw[raw["created_at"] < last_day])
+
+        for date_range, (hours, rolling_average) in date_ranges.items():
+            pipeline = LocationPipeline(
+                MeasurementStore(client, location, refresh_interval=0),
+                RollupStore(rollups_dir, location),
+                get_sunrise_sunset,
+                chart_points=1000,
+            )
+            for run in range(repeat + 1):
+                profile = instrumentation.start_profile(f"{name}/{date_range}")
+                render(pipeline, hours, rolling_average)
+                profile.finish()
+                # total time per span name, spans like the supabase requests
+                # occur several times per render
+                durations = {"total": profile.duration * 1000}
+                for span in profile.spans:
+                    durations[span["name"]] = (
+                        durations.get(span["name"], 0) + span["duration_ms"]
+                    )
+                temperature = "cold" if run == 0 else "warm"
+                for stage, duration in durations.items():
+                    key = f"{name}/{date_range}/{temperature}/{stage}"
+                    results[key] = min(results.get(key, float("inf")), duration)
+            print(
+                f"{name:>4} {date_range:>4} {len(raw):>8} rows "
+                f"cold {results[f'{name}/{date_range}/cold/total']:>8.1f} ms "
+                f"warm {results[f'{name}/{date_range}/warm/total']:>8.1f} ms "
+                f"spec {profile.counters['chart_spec_bytes'] / 1e3:>6.0f} kB"
+            )
+    return results
+
+
+def report_regressions(results: dict, baseline: dict) -> list:
+    regressions = []
+    for key, duration in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if (
+            duration > previous * regression_threshold
+            and duration - previous > min_regression_ms
+        ):
+            regressions.append((key, previous, duration))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the per-range pipeline of the dashboard on synthetic data."
+    )
+    parser.add_argument(
+        "--datasets", nargs="+", default=["1d", "30d", "1y"], choices=list(datasets)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--baseline",
+        default=os.path.join(os.path.dirname(__file__), "baseline.json"),
+        help="Results of a previous run to compare against.",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Save the results as the new baseline."
+    )
+    args = parser.parse_args()
+
+    # streamlit sends the data itself, so the altair row limit does not apply
+    alt.data_transformers.disable_max_rows()
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    results = {}
+    # no network: the sunrise api is answered locally
+    with mock.patch.object(sunrise_sunset.requests, "get", fake_sunrise_sunset_get):
+        for name in args.datasets:
+            results.update(run_dataset(name, datasets[name], args.repeat))
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = report_regressions(results, baseline)
+        for key, previous, duration in regressions:
+            print(f"REGRESSION {key}: {previous:.1f} ms -> {duration:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print("no regressions")
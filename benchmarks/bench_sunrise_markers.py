@@ -0,0 +1,77 @@
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from processing import add_sunrise_sunset_markers
+
+
+def add_sunrise_sunset_markers_loop(df, df_sunrise_sunset):
+    # previous implementation, one full scan of created_at per event
+    df["sunrise_sunset"] = 0
+    for index, row in df_sunrise_sunset.iterrows():
+        sunrise = row["sunrise"]
+        sunset = row["sunset"]
+        df.loc[
+            (df["created_at"] - sunrise).abs().idxmin(),
+            ["sunrise_sunset", "sunrise_sunset_type"],
+        ] = [1, "Sunrise"]
+        df.loc[
+            (df["created_at"] - sunset).abs().idxmin(),
+            ["sunrise_sunset", "sunrise_sunset_type"],
+        ] = [1, "Sunset"]
+    df["sunrise_sunset"] = df["sunrise_sunset"].shift(-1)
+    df["sunrise_sunset_type"] = df["sunrise_sunset_type"].shift(-1)
+    return df
+
+
+def make_data(days: int):
+    created_at = pd.date_range("2024-11-12", periods=days * 1440, freq="1min", tz="UTC")
+    df = pd.DataFrame(
+        {
+            "created_at": created_at,
+            "temperature": 20 + np.sin(np.arange(len(created_at)) / 1440 * 2 * np.pi),
+        }
+    )
+    dates = pd.date_range("2024-11-12", periods=days, freq="1D", tz="UTC")
+    df_sunrise_sunset = pd.DataFrame(
+        {
+            "sunrise": dates + pd.Timedelta(hours=7, minutes=13),
+            "sunset": dates + pd.Timedelta(hours=16, minutes=47),
+        }
+    )
+    return df, df_sunrise_sunset
+
+
+if __name__ == "__main__":
+    df, df_sunrise_sunset = make_data(days=365)
+    print(f"{len(df)} measurements, {len(df_sunrise_sunset)} days")
+
+    expected = add_sunrise_sunset_markers_loop(df.copy(), df_sunrise_sunset)
+    result = add_sunrise_sunset_markers(df.copy(), df_sunrise_sunset)
+    # the markers are int8 with a 0 instead of NaN in the last row, the types
+    # categorical
+    pd.testing.assert_series_equal(
+        expected["sunrise_sunset"].fillna(0),
+        result["sunrise_sunset"],
+        check_dtype=False,
+    )
+    pd.testing.assert_series_equal(
+        expected["sunrise_sunset_type"].fillna(""),
+        result["sunrise_sunset_type"].astype(object).fillna(""),
+    )
+
+    for name, func, number in [
+        ("before (iterrows + idxmin)", add_sunrise_sunset_markers_loop, 1),
+        ("after (searchsorted)", add_sunrise_sunset_markers, 10),
+    ]:
+        seconds = min(
+            timeit.repeat(
+                lambda: func(df.copy(), df_sunrise_sunset), number=number, repeat=3
+            )
+        )
+        print(f"{name}: {seconds / number * 1000:.1f} ms")
@@ -0,0 +1,172 @@
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from sunrise_sunset import compute_sunrise_sunset
+
+
+# in-memory stand-in for the supabase client, supporting the
+# table(...).select().eq().gt()/gte()/lt()/lte().order().limit().execute()
+# chains of the dashboard and the dashboard_snapshot function of
+# sql/dashboard_snapshot.sql. the measurements of each location are kept sorted by
+# created_at, so time filters are binary searches and a page costs O(page).
+class FakeSupabaseClient:
+
+    def __init__(self, measurements: pd.DataFrame, latency: float = 0):
+        self.latency = latency
+        self.requests = 0
+        self.measurements = {
+            location: df.sort_values("created_at").reset_index(drop=True)
+            for location, df in measurements.groupby("location", observed=True)
+        }
+
+    def table(self, name: str):
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict):
+        if name != "dashboard_snapshot":
+            raise ValueError(f"Unknown function {name}")
+        return FakeSnapshotCall(self, params)
+
+
+class FakeSnapshotCall:
+
+    def __init__(self, client: FakeSupabaseClient, params: dict):
+        self.client = client
+        self.params = params
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        window = pd.Timedelta(seconds=self.params["window_seconds"])
+        locations, frames = [], []
+        for location, df in self.client.measurements.items():
+            created_at = df["created_at"]
+            latest = created_at.iloc[-1] if len(df) else None
+            locations.append(
+                {
+                    "location": location,
+                    "latest": None if latest is None else latest.isoformat(),
+                }
+            )
+            cursor = self.params["cursors"].get(location)
+            if cursor is not None:
+                start = created_at.searchsorted(pd.Timestamp(cursor), side="right")
+            elif latest is not None:
+                start = created_at.searchsorted(latest - window, side="left")
+            else:
+                start = len(df)
+            frames.append(
+                df.iloc[start:][["location", "created_at", "temperature", "humidity"]]
+            )
+        measurements = pd.concat(frames) if frames else pd.DataFrame()
+        rows = json.loads(measurements.to_json(orient="records", date_format="iso"))
+        return SimpleNamespace(data={"locations": locations, "measurements": rows})
+
+
+class FakeQuery:
+
+    def __init__(self, client: FakeSupabaseClient, table: str):
+        self.client = client
+        self.table = table
+        self.columns = None
+        self.filters = []
+        self.descending = False
+        self.row_limit = None
+
+    def select(self, columns: str = "*"):
+        if columns != "*":
+            self.columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append((column, "eq", value))
+        return self
+
+    def gt(self, column: str, value):
+        self.filters.append((column, "gt", value))
+        return self
+
+    def gte(self, column: str, value):
+        self.filters.append((column, "gte", value))
+        return self
+
+    def lt(self, column: str, value):
+        self.filters.append((column, "lt", value))
+        return self
+
+    def lte(self, column: str, value):
+        self.filters.append((column, "lte", value))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        # the measurements are only ever ordered by created_at
+        self.descending = desc
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        if self.table == "locations":
+            rows = [{"location": location} for location in self.client.measurements]
+            return SimpleNamespace(data=rows)
+
+        location = next(v for c, op, v in self.filters if c == "location")
+        df = self.client.measurements.get(location)
+        if df is None:
+            return SimpleNamespace(data=[])
+        created_at = df["created_at"]
+        start, end = 0, len(df)
+        for column, op, value in self.filters:
+            if column != "created_at":
+                continue
+            value = pd.Timestamp(value)
+            if op in ("gt", "lte"):
+                position = created_at.searchsorted(value, side="right")
+            else:
+                position = created_at.searchsorted(value, side="left")
+            if op in ("gt", "gte"):
+                start = max(start, position)
+            else:
+                end = min(end, position)
+        if self.descending:
+            positions = np.arange(end - 1, start - 1, -1)
+        else:
+            positions = np.arange(start, max(start, end))
+        if self.row_limit is not None:
+            positions = positions[: self.row_limit]
+
+        page = df.iloc[positions]
+        if self.columns is not None:
+            page = page[self.columns]
+        # the same json types as postgrest returns
+        rows = json.loads(page.to_json(orient="records", date_format="iso"))
+        return SimpleNamespace(data=rows)
+
+
+def fake_sunrise_sunset_get(url, params, timeout=None):
+    # stand-in for requests.get of api.sunrisesunset.io, the results are
+    # computed locally and formatted like the api does
+    df = compute_sunrise_sunset(
+        params["date_start"], params["date_end"], params["lat"], params["lng"]
+    )
+    results = []
+    for row in df.to_dict("records"):
+        result = {"date": row["date"]}
+        for key in ["sunrise", "sunset", "dawn", "dusk", "solar_noon"]:
+            result[key] = row[key].strftime("%-I:%M:%S %p")
+        result.update(day_length=row["day_length"], timezone="UTC", utc_offset=0)
+        results.append(result)
+    content = json.dumps({"results": results, "status": "OK"}).encode()
+    return SimpleNamespace(
+        status_code=200, content=content, json=lambda: json.loads(content)
+    )
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+
+def generate_measurements(
+    days: float,
+    location: str = "living",
+    start: str = "2024-11-12",
+    seed: int = 0,
+    outages_per_day: float = 0.2,
+    glitch_rate: float = 0.001,
+) -> pd.DataFrame:
+    # minutely readings of a DHT-11 in a heated room: a daily and a seasonal
+    # cycle plus noise, quantized to the sensor resolution of 0.1 °C and 1 %.
+    # the sensor drops out now and then (gaps of minutes to hours), readings
+    # jitter by a few seconds and some readings are glitches, labeled in the
+    # glitch column (spike, stuck or failed).
+    rng = np.random.default_rng(seed)
+    n = int(days * 1440)
+    created_at = pd.date_range(start, periods=n, freq="1min", tz="UTC")
+    created_at = created_at + pd.to_timedelta(rng.integers(0, 5, n), unit="s")
+
+    day = np.arange(n) / 1440
+    daily = np.sin(2 * np.pi * (day - 0.375))
+    seasonal = np.cos(2 * np.pi * (day + 52) / 365.25)
+    # slowly changing weather, interpolated between random daily offsets
+    weather_days = int(days) + 2
+    weather = np.interp(day, np.arange(weather_days), rng.normal(0, 1, weather_days))
+    temperature = 20.5 + 1.5 * daily - 1.0 * seasonal + 0.5 * weather
+    temperature += rng.normal(0, 0.15, n)
+    humidity = 48 - 4 * daily + 8 * seasonal + 3 * weather + rng.normal(0, 1, n)
+
+    # glitches: implausible spikes and failed reads
+    glitches = rng.random(n) < glitch_rate
+    kind = rng.integers(0, 3, n)
+    spikes = glitches & (kind == 0)
+    temperature[spikes] += rng.choice([-15, 15], spikes.sum())
+    stuck = glitches & (kind == 1)
+    humidity[stuck] = rng.choice([0, 95], stuck.sum())
+    temperature[glitches & (kind == 2)] = np.nan
+    humidity[glitches & (kind == 2)] = np.nan
+    glitch = pd.Categorical.from_codes(
+        np.where(glitches, kind, -1), categories=["spike", "stuck", "failed"]
+    )
+
+    # outages: exponentially distributed durations, median of about 10 minutes
+    keep = np.ones(n, dtype=bool)
+    for outage_start in rng.integers(0, n, rng.poisson(outages_per_day * days)):
+        duration = int(rng.exponential(15)) + 1
+        keep[outage_start : outage_start + duration] = False
+
+    return pd.DataFrame(
+        {
+            "created_at": created_at[keep],
+            "temperature": temperature[keep].round(1),
+            "humidity": humidity[keep].round(0).clip(0, 100),
+            "location": pd.Categorical([location] * keep.sum()),
+            "glitch": glitch[keep],
+        }
+    ).reset_index(drop=True)
@@ -0,0 +1,325 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+
+value_columns = ["temperature", "temperature_mean", "humidity", "humidity_mean"]
+# segment numbers the parts of the recording between gaps, see split_segments
+chart_columns = ["created_at", *value_columns, "segment"]
+sunrise_sunset_columns = ["sunrise_sunset", "sunrise_sunset_type"]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    # largest-triangle-three-buckets: keep the first and the last point and from
+    # each bucket in between the point that forms the largest triangle with the
+    # previously selected point and the average of the next bucket
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end : edges[i + 2]].mean()
+            next_y = y[end : edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + np.argmax(area)
+        selected[i + 1] = a
+    return selected
+
+
+def prepare_chart_data(
+    df: pd.DataFrame, max_points: int = None, sunrise_sunset: bool = True
+) -> pd.DataFrame:
+    # keep only the columns used by the chart and reduce every series to at most
+    # max_points with lttb. the rows selected for any series are kept for all
+    # series, so the layers can still share one dataset.
+    columns = chart_columns + (sunrise_sunset_columns if sunrise_sunset else [])
+    if max_points is None or len(df) <= max_points:
+        chart_df = df[columns].reset_index(drop=True)
+    else:
+        chart_df = df.loc[lttb_mask(df, max_points, sunrise_sunset), columns]
+        chart_df = chart_df.reset_index(drop=True)
+    # float32 values would be serialized with spurious digits (20.100000381...),
+    # two decimals are finer than the sensor resolution
+    chart_df[value_columns] = chart_df[value_columns].astype("float64").round(2)
+    return chart_df
+
+
+def lttb_mask(df: pd.DataFrame, max_points: int, sunrise_sunset: bool) -> np.ndarray:
+    x = df["created_at"].to_numpy(dtype="datetime64[ns]").astype(float)
+    keep = np.zeros(len(df), dtype=bool)
+    for column in value_columns:
+        y = df[column].to_numpy(dtype=float)
+        valid = ~np.isnan(y)
+        indices = np.flatnonzero(valid)
+        keep[indices[lttb_indices(x[indices], y[indices], max_points)]] = True
+        # keep the start and end of gaps, so that they are not bridged
+        changes = np.flatnonzero(np.diff(valid))
+        keep[changes] = True
+        keep[changes + 1] = True
+    # and the first and last point of every segment
+    segment_changes = np.flatnonzero(np.diff(df["segment"].to_numpy()))
+    keep[segment_changes] = True
+    keep[segment_changes + 1] = True
+    if sunrise_sunset:
+        keep |= (df["sunrise_sunset"] == 1).to_numpy()
+    return keep
+
+
+def build_measurement_chart(
+    df: pd.DataFrame,
+    rolling_average_display: str,
+    display_temperature: bool = True,
+    display_humidity: bool = True,
+    display_temperature_mean: bool = True,
+    display_humidity_mean: bool = True,
+    display_sunrise_sunset: bool = False,
+) -> alt.LayerChart:
+    base = alt.Chart().encode(x=alt.X("created_at:T", title=""))
+    # one line per segment, so that gaps in the recording are not bridged
+    lines = base.encode(detail="segment:N") if "segment" in df.columns else base
+
+    # show vertical lines for sunrise and sunset times, i.e. when sunrise and sunset are 1
+    sunrise_sunset = (
+        base.mark_rule(strokeDash=[5, 5])
+        .encode(
+            x="created_at:T",
+            color=alt.Color(
+                "sunrise_sunset_type:N",
+                scale=alt.Scale(range=["orange", "purple"]),
+                legend=None,
+            ),
+            tooltip=[
+                alt.Tooltip("sunrise_sunset_type:N", title="Event"),
+                alt.Tooltip(
+                    "created_at:T", title="Time", format="%Y-%m-%d %H:%M"
+                ),
+            ],
+        )
+        .transform_filter("datum.sunrise_sunset == 1")
+    )
+    # make the vertical lines into arrows for sunrise and sunset times
+    sunrise_sunset = sunrise_sunset.transform_calculate(
+        y="datum.sunrise_sunset_type == 'Sunrise' ? 0 : 400"
+    )
+
+    hover = alt.selection_point(
+        fields=["created_at"],
+        nearest=True,
+        on="mouseover",
+        empty="none",
+        clear="mouseout",
+    )
+
+    # Create a line for temperature
+    min_temp_scale = df["temperature"].min() - 2
+    max_temp_scale = df["temperature"].max() + 2
+    temperature_axis = alt.Axis(titleColor="red", title="Temperature (°C)")
+    temperature_scale = alt.Scale(domain=[min_temp_scale, max_temp_scale])
+    temperature_line = lines.mark_line(
+        color="red", interpolate="monotone"
+    ).encode(
+        y=alt.Y(
+            "temperature:Q",
+            axis=temperature_axis,
+            scale=temperature_scale,
+        )
+    )
+
+    rolling_average_temperature_line = lines.mark_line(
+        color="salmon", interpolate="monotone"
+    ).encode(
+        y=alt.Y(
+            "temperature_mean:Q",
+            axis=temperature_axis,
+            scale=temperature_scale,
+        )
+    )
+    if display_temperature and not display_temperature_mean:
+        temperature_line = temperature_line
+    elif display_temperature and display_temperature_mean:
+        temperature_line = temperature_line + rolling_average_temperature_line
+    elif not display_temperature and display_temperature_mean:
+        temperature_line = rolling_average_temperature_line
+
+    # Create a line for humidity with a secondary y-axis
+    min_humidity_scale = df["humidity"].min() - 5
+    max_humidity_scale = df["humidity"].max() + 5
+    humidity_axis = alt.Axis(titleColor="blue", title="Humidity (%)")
+    humidity_scale = alt.Scale(domain=[min_humidity_scale, max_humidity_scale])
+    humidity_line = lines.mark_line(color="blue", interpolate="monotone").encode(
+        y=alt.Y(
+            "humidity:Q",
+            axis=humidity_axis,
+            scale=humidity_scale,
+        ),
+    )
+
+    rolling_average_humidity_line = lines.mark_line(
+        color="lightblue", interpolate="monotone"
+    ).encode(
+        y=alt.Y(
+            "humidity_mean:Q",
+            axis=humidity_axis,
+            scale=humidity_scale,
+        ),
+    )
+    if display_humidity and not display_humidity_mean:
+        humidity_line = humidity_line
+    elif display_humidity and display_humidity_mean:
+        humidity_line = humidity_line + rolling_average_humidity_line
+    elif not display_humidity and display_humidity_mean:
+        humidity_line = rolling_average_humidity_line
+
+    # hover_line = (
+    #     base.mark_rule(color="gray", strokeDash=[5, 5])
+    #     .encode(opacity=alt.condition(hover, alt.value(1), alt.value(0)))
+    #     .add_params(hover)
+    # )
+
+    # Points to show nearest values on hover for temperature and humidity
+    # temperature_points = (
+    #     base.mark_circle(color="red", size=50)
+    #     .encode(
+    #         y="temperature:Q",
+    #         opacity=alt.condition(hover, alt.value(1), alt.value(0)),
+    #     )
+    #     .transform_filter(hover)
+    # )
+
+    # humidity_points = (
+    #     base.mark_circle(color="blue")
+    #     .encode(y="humidity:Q", opacity=alt.condition(hover, alt.value(1), alt.value(0)))
+    #     .transform_filter(hover)
+    # )
+
+    # Tooltip to display temperature and humidity values on hover
+    tooltips = (
+        base.mark_rule()
+        .encode(
+            opacity=alt.condition(hover, alt.value(0.1), alt.value(0)),
+            tooltip=[
+                alt.Tooltip(
+                    "created_at:T", title="Time", format="%Y-%m-%d %H:%M"
+                ),
+                alt.Tooltip("temperature:Q", title="Temperature (°C)"),
+                alt.Tooltip(
+                    "temperature_mean:Q",
+                    title=f"Rolling {rolling_average_display} Temperature (°C)",
+                ),
+                alt.Tooltip("humidity:Q", title="Humidity (%)"),
+                alt.Tooltip(
+                    "humidity_mean:Q",
+                    title=f"Rolling  {rolling_average_display} Humidity (%)",
+                ),
+            ],
+        )
+        .add_params(hover)
+    )
+
+    # Layer all elements
+    layers = []
+    if display_temperature or display_temperature_mean:
+        layers.append(temperature_line)
+    if display_humidity or display_humidity_mean:
+        layers.append(humidity_line)
+    if display_temperature or display_humidity:
+        layers.append(tooltips)
+    if display_sunrise_sunset:
+        layers.append(sunrise_sunset)
+    # the data is attached once to the layered chart, so all layers share a
+    # single dataset in the spec
+    chart = (
+        alt.layer(*layers, data=df)
+        .resolve_scale(y="independent")
+        .properties(width=600, height=400, title="")
+    )
+
+    return chart
+
+
+# column -> title and color scheme of the heatmap and calendar views
+cube_chart_columns = {
+    "temperature": ("Temperature (°C)", "redyellowblue"),
+    "humidity": ("Humidity (%)", "blues"),
+}
+
+
+def round_values(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # float32 values would be serialized with spurious digits
+    return df.assign(**{c: df[c].astype("float64").round(1) for c in columns})
+
+
+def build_heatmap_chart(df: pd.DataFrame) -> alt.VConcatChart:
+    # day x hour of day, one cell per hour with the mean of the hour. the days
+    # are UTC days, so the utc time units keep the cells on their day.
+    charts = []
+    for column, (title, scheme) in cube_chart_columns.items():
+        charts.append(
+            alt.Chart()
+            .mark_rect()
+            .encode(
+                x=alt.X("utcyearmonthdate(day):T", title=""),
+                y=alt.Y("hour:O", title="Hour (UTC)"),
+                color=alt.Color(
+                    f"{column}:Q",
+                    title=title,
+                    scale=alt.Scale(
+                        scheme=scheme, reverse=column == "temperature"
+                    ),
+                ),
+                tooltip=[
+                    alt.Tooltip("utcyearmonthdate(day):T", title="Day"),
+                    alt.Tooltip("hour:O", title="Hour (UTC)"),
+                    alt.Tooltip(f"{column}:Q", title=title),
+                ],
+            )
+            .properties(width=600, height=200)
+        )
+    # the data is attached once, so both charts share a single dataset
+    return alt.vconcat(
+        *charts, data=round_values(df, list(cube_chart_columns))
+    ).resolve_scale(color="independent")
+
+
+def build_calendar_chart(df: pd.DataFrame) -> alt.VConcatChart:
+    # one calendar of weeks x weekdays per column and daily minimum / maximum
+    charts = []
+    for column, (title, scheme) in cube_chart_columns.items():
+        for statistic, name in [("max", "Maximum"), ("min", "Minimum")]:
+            charts.append(
+                alt.Chart(title=f"Daily {name} {title}")
+                .mark_rect()
+                .encode(
+                    x=alt.X(
+                        "utcyearweek(day):O", title="", axis=alt.Axis(labels=False)
+                    ),
+                    y=alt.Y("utcday(day):O", title=""),
+                    color=alt.Color(
+                        f"{column}_{statistic}:Q",
+                        title=title,
+                        scale=alt.Scale(
+                            scheme=scheme, reverse=column == "temperature"
+                        ),
+                    ),
+                    tooltip=[
+                        alt.Tooltip("utcyearmonthdate(day):T", title="Day"),
+                        alt.Tooltip(f"{column}_min:Q", title="Minimum"),
+                        alt.Tooltip(f"{column}_mean:Q", title="Mean"),
+                        alt.Tooltip(f"{column}_max:Q", title="Maximum"),
+                    ],
+                )
+                .properties(width=600, height=120)
+            )
+    values = [f"{c}_{s}" for c in cube_chart_columns for s in ["min", "mean", "max"]]
+    return alt.vconcat(*charts, data=round_values(df, values)).resolve_scale(
+        color="independent"
+    )
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+cleaning_columns = ["temperature", "humidity"]
+# readings outside of these bounds are failed reads of the DHT-11, e.g. 0 % or
+# 100 % humidity
+valid_ranges = {"temperature": (-20, 60), "humidity": (0, 100)}
+# a reading is rejected if it deviates from the rolling median of the last
+# outlier_window readings by more than outlier_threshold scaled MADs, and by
+# at least min_deviation. the minimum keeps quantized, almost constant readings
+# (MAD of 0) from being rejected for a single step.
+outlier_window = 15
+outlier_threshold = 5
+min_deviation = {"temperature": 4, "humidity": 15}
+# the MAD is the rolling median of the deviations from the rolling median, so
+# the first row needs two windows of readings before it
+context_rows = 2 * (outlier_window - 1)
+# the chart breaks its lines where consecutive points are further apart than
+# this, or than one bucket of the resolution
+gap_threshold = pd.Timedelta(minutes=10)
+
+
+def reject_outliers(df: pd.DataFrame, context: pd.DataFrame = None) -> pd.DataFrame:
+    # replace implausible readings and spikes by NaN, the rows are kept. the
+    # windows only look back, so the readings can be cleaned as they arrive:
+    # context are the (already cleaned) readings before df. the rolling medians
+    # are computed in C with a fixed window, so this is O(n) over df.
+    if df.empty:
+        return df
+    with instrumentation.span("cleaning.reject_outliers"):
+        n_context = 0 if context is None else min(len(context), context_rows)
+        df = df.copy()
+        for column in cleaning_columns:
+            values = df[column].to_numpy(dtype=float)
+            if n_context:
+                values = np.concatenate(
+                    [context[column].to_numpy(dtype=float)[-n_context:], values]
+                )
+            low, high = valid_ranges[column]
+            with np.errstate(invalid="ignore"):
+                values[(values <= low) | (values >= high)] = np.nan
+
+            series = pd.Series(values)
+            min_periods = outlier_window // 2 + 1
+            median = series.rolling(outlier_window, min_periods=min_periods).median()
+            deviation = (series - median).abs()
+            mad = deviation.rolling(outlier_window, min_periods=min_periods).median()
+            limit = np.maximum(
+                outlier_threshold * 1.4826 * mad.to_numpy(), min_deviation[column]
+            )
+            # NaN deviations and limits of the first readings compare as False
+            with np.errstate(invalid="ignore"):
+                outliers = deviation.to_numpy() > limit
+            values[outliers] = np.nan
+            instrumentation.count("rejected_readings", int(outliers[n_context:].sum()))
+            df[column] = values[n_context:].astype(df[column].dtype)
+    return df
+
+
+def split_segments(df: pd.DataFrame, max_gap: pd.Timedelta) -> pd.DataFrame:
+    # drop the rows without any reading (missing minutes or buckets of sensor
+    # outages) and number the segments between the gaps longer than max_gap,
+    # so that the chart breaks its lines there instead of interpolating
+    empty = df[cleaning_columns].isna().all(axis=1).to_numpy()
+    if empty.any():
+        df = df.loc[~empty].reset_index(drop=True)
+    created_at = df["created_at"].values
+    gaps = np.diff(created_at, prepend=created_at[:1])
+    df["segment"] = np.cumsum(gaps > max_gap.to_timedelta64()).astype(np.int32)
+    return df
@@ -0,0 +1,125 @@
+import copy
+import json
+import os
+import tomllib
+
+# the settings of the dashboard are the defaults below, overridden by the
+# config file (dashboard.toml or the path in DASHBOARD_CONFIG) and then by
+# environment variables named DASHBOARD_<SETTING>, e.g.
+# DASHBOARD_REFRESH_INTERVAL=30. lists and tables are given as json in the
+# environment.
+config_env = "DASHBOARD_CONFIG"
+default_config_path = "dashboard.toml"
+env_prefix = "DASHBOARD_"
+
+defaults = {
+    # sites with their coordinates for sunrise and sunset. a site lists its
+    # locations, the first site also has all locations no site lists.
+    "sites": [
+        {
+            "name": "HW7",
+            "lat": 49.879244743989915,
+            "lon": 8.667196238775123,
+            "locations": [],
+        }
+    ],
+    "default_enable_auto_refresh": False,
+    "default_enable_lazy_loading": True,
+    "default_enable_compare_mode": False,
+    "default_enable_live_updates": False,
+    "default_enable_notifications": False,
+    "default_enable_notification_sound": False,
+    "default_display_temp": True,
+    "default_display_humidty": True,
+    "default_display_temp_mean": True,
+    "default_display_humidty_mean": True,
+    "default_display_sunrise_sunset": False,
+    "default_min_temp_threshold": 15,
+    "default_max_temp_threshold": 25,
+    "default_min_humid_threshold": 0,
+    "default_max_humid_threshold": 65,
+    "temp_alert_hysteresis": 0.5,
+    "humid_alert_hysteresis": 2,
+    "alert_cooldown": 15 * 60,
+    "sound_path": "https://cdn.pixabay.com/audio/2022/12/12/audio_e6f0105ae1.mp3",
+    "refresh_interval": 60,
+    "live_update_interval": 10,
+    "start_of_recording_date": "2024-11-12",
+    "rollups_dir": "rollups",
+    "max_chart_points": 2000,
+    "chart_points": 1000,
+    "fetch_page_size": 1000,
+    # the measurements loaded with the locations on the first run: the longest
+    # range served at 1 minute resolution (24h) plus its rolling average (6h)
+    "snapshot_window_hours": 30,
+    # sunrise and sunset markers, the module is only imported if enabled
+    "enable_sunrise_sunset": True,
+    "sunrise_sunset_cache_path": "sunrise_sunset.sqlite",
+    # compute sunrise and sunset locally instead of requesting
+    # api.sunrisesunset.io
+    "sunrise_sunset_offline": False,
+    # push notifications, the module is only imported if enabled
+    "enable_notifications": True,
+    "archive_dir": "archive",
+    # serve the dashboard from the local archive alone, without supabase
+    "use_database": True,
+    "default_enable_profiling": False,
+    # ranges that can be shown as a day x hour heatmap or a calendar of the days
+    "cube_view_ranges": ["30d", "Max"],
+    # rows per page of the raw data table
+    "raw_data_page_size": 100,
+    # append the timing spans and counters of every run as json lines, or ""
+    "profile_log_path": "",
+    # fill the shared caches of all locations in the background when the
+    # process serves its first run
+    "enable_prewarm": True,
+    "prewarm_ranges": ["1h", "6h", "24h"],
+}
+
+
+def parse_env_value(value: str, default):
+    # environment variables are parsed as the type of the default
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, (int, float)):
+        number = float(value)
+        if isinstance(default, int) and number.is_integer():
+            return int(number)
+        return number
+    if isinstance(default, (list, dict)):
+        return json.loads(value)
+    return value
+
+
+def load_config(path: str = None, environ=os.environ) -> dict:
+    config = copy.deepcopy(defaults)
+    path = path or environ.get(config_env, default_config_path)
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            file_config = tomllib.load(file)
+        unknown = set(file_config) - set(defaults)
+        if unknown:
+            raise ValueError(
+                f"Unknown settings in {path}: {', '.join(sorted(unknown))}"
+            )
+        config.update(file_config)
+    for name, default in defaults.items():
+        value = environ.get(env_prefix + name.upper())
+        if value is not None:
+            config[name] = parse_env_value(value, default)
+
+    if not config["sites"]:
+        raise ValueError("At least one site is required.")
+    for site in config["sites"]:
+        missing = {"name", "lat", "lon"} - set(site)
+        if missing:
+            raise ValueError(f"Site without {', '.join(sorted(missing))}: {site}")
+        site.setdefault("locations", [])
+    return config
+
+
+def site_of(config: dict, location: str) -> dict:
+    for site in config["sites"]:
+        if location in site["locations"]:
+            return site
+    return config["sites"][0]
@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from measurement_store import to_utc
+from rolling import Buffer
+
+cube_columns = ["temperature", "humidity"]
+hour = pd.Timedelta(hours=1)
+
+
+# hourly aggregates (mean, min, max and count per column) of a single location
+# on a dense grid of hours from start on, i.e. a day x hour-of-day cube. new
+# hours are added from the 1 hour rollups in O(new hours), earlier hours only
+# when a range reaching further back is requested. the heatmap of a year is a
+# slice of about 8760 cells instead of the minutes of the year.
+class HourlyCube:
+
+    def __init__(self):
+        self.start = None
+        self.counts = Buffer(dtype=np.int32)
+        self.values = {
+            f"{column}{suffix}": Buffer(dtype=np.float32)
+            for column in cube_columns
+            for suffix in ["", "_min", "_max"]
+        }
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def update_from(self):
+        # the last hour may be incomplete, so updates have to start there
+        if self.start is None or len(self) == 0:
+            return None
+        return self.start + (len(self) - 1) * hour
+
+    def update(self, hourly: pd.DataFrame, start=None):
+        # hourly are 1 hour rollups starting at update_from, or at start (an
+        # hour) for the first update or to extend the cube backwards. the hours
+        # from start to the first hour of the cube have to be complete.
+        with self.lock, instrumentation.span("cube.update"):
+            if start is not None and self.start is None:
+                self.start = start
+            elif start is not None and start < self.start:
+                self._prepend(hourly[hourly["created_at"] < self.start], start)
+                return
+            if self.start is not None:
+                hourly = hourly[hourly["created_at"] >= self.start]
+            if hourly.empty:
+                return
+            first_hour = hourly["created_at"].iloc[0]
+            if self.start is None:
+                self.start = first_hour
+            index = (first_hour - self.start) // hour
+            self.counts.truncate(index)
+            for buffer in self.values.values():
+                buffer.truncate(index)
+            # fill the hours without rollups, e.g. between the last known hour
+            # and the new ones
+            grid = pd.date_range(
+                self.start + len(self) * hour, hourly["created_at"].iloc[-1], freq="1h"
+            )
+            hourly = hourly.set_index("created_at").reindex(grid)
+            self.counts.extend(hourly["count"].fillna(0).to_numpy(dtype=np.int32))
+            for name, buffer in self.values.items():
+                buffer.extend(hourly[name].to_numpy(dtype=np.float32))
+
+    def _prepend(self, hourly: pd.DataFrame, start):
+        grid = pd.date_range(start, self.start, freq="1h", inclusive="left")
+        hourly = hourly.set_index("created_at").reindex(grid)
+        self.counts.prepend(hourly["count"].fillna(0).to_numpy(dtype=np.int32))
+        for name, buffer in self.values.items():
+            buffer.prepend(hourly[name].to_numpy(dtype=np.float32))
+        self.start = start
+
+    def _slice(self, from_date, to_date):
+        # grid positions of the hours of [from_date, to_date]
+        first = max(-((self.start - to_utc(from_date).floor("1h")) // hour), 0)
+        last = min((to_utc(to_date) - self.start) // hour, len(self) - 1)
+        return np.arange(first, last + 1)
+
+    def heatmap(self, from_date, to_date) -> pd.DataFrame:
+        # one row per hour with measurements: day, hour of day and the means
+        with self.lock:
+            if self.start is None or len(self) == 0:
+                return pd.DataFrame(columns=["day", "hour", *cube_columns])
+            index = self._slice(from_date, to_date)
+            index = index[self.counts[index] > 0]
+            created_at = self.start + pd.to_timedelta(index, unit="h")
+            df = pd.DataFrame(
+                {"day": created_at.floor("1D"), "hour": created_at.hour.astype(np.int8)}
+            )
+            for column in cube_columns:
+                df[column] = self.values[column][index]
+        return df
+
+    def calendar(self, from_date, to_date) -> pd.DataFrame:
+        # one row per day with measurements: daily min, mean and max per column
+        columns = [f"{c}_{s}" for c in cube_columns for s in ["min", "mean", "max"]]
+        with self.lock:
+            if self.start is None or len(self) == 0:
+                return pd.DataFrame(columns=["day", *columns])
+            index = self._slice(from_date, to_date)
+            counts = self.counts[index]
+            hours = pd.DataFrame(
+                {"day": (self.start + pd.to_timedelta(index, unit="h")).floor("1D")}
+            )
+            for column in cube_columns:
+                mean = self.values[column][index].astype(float)
+                # the daily mean is weighted by the readings of each hour
+                hours[f"{column}_sum"] = mean * counts
+                hours[f"{column}_count"] = np.where(np.isnan(mean), 0, counts)
+                hours[f"{column}_min"] = self.values[f"{column}_min"][index]
+                hours[f"{column}_max"] = self.values[f"{column}_max"][index]
+        days = hours.groupby("day").agg(
+            {
+                name: aggregation
+                for column in cube_columns
+                for name, aggregation in [
+                    (f"{column}_min", "min"),
+                    (f"{column}_max", "max"),
+                    (f"{column}_sum", "sum"),
+                    (f"{column}_count", "sum"),
+                ]
+            }
+        )
+        for column in cube_columns:
+            count = days.pop(f"{column}_count").replace(0, np.nan)
+            days[f"{column}_mean"] = days.pop(f"{column}_sum") / count
+        days = days[columns].dropna(how="all").reset_index()
+        return days
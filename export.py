@@ -0,0 +1,100 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import instrumentation
+from measurement_store import measurement_dtypes, to_utc
+from rollups import compute_rollup, rollup_dtypes
+
+# export format -> mime type and file extension
+export_formats = {
+    "CSV": ("text/csv", "csv"),
+    "Parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+# raw measurements or one of the rollup resolutions
+export_resolutions = ["raw", "1min", "15min", "1h", "1d"]
+# rows are read, aggregated and encoded one chunk at a time. a week is about
+# 10000 measurements per location, and whole days keep the buckets of every
+# resolution within a chunk.
+export_chunk = pd.Timedelta(days=7)
+
+
+def export_chunks(stores: dict, from_date, to_date, resolution: str):
+    # yields the measurements of [from_date, to_date) of every location, chunk by
+    # chunk, with a location column. stores maps the locations to their
+    # measurement stores.
+    from_date, to_date = to_utc(from_date), to_utc(to_date)
+    if resolution != "raw":
+        # complete buckets only
+        from_date = from_date.floor(resolution)
+    for location, store in stores.items():
+        context = None
+        chunk_start = from_date
+        while chunk_start < to_date:
+            chunk_end = min(chunk_start + export_chunk, to_date)
+            with instrumentation.span("export.read"):
+                raw = store.read(chunk_start, chunk_end, context=context)
+            context = raw
+            if resolution == "raw":
+                df = raw.reset_index(drop=True)
+            else:
+                df = compute_rollup(raw, resolution)
+                df = df[df["count"] > 0].reset_index(drop=True)
+            df.insert(0, "location", location)
+            instrumentation.count("export_rows", len(df))
+            yield df
+            chunk_start = chunk_end
+
+
+def export_schema(resolution: str) -> pa.Schema:
+    # the types are given up front: chunks without rows, e.g. before the start
+    # of the recording, would otherwise make location a column of nulls
+    dtypes = measurement_dtypes if resolution == "raw" else rollup_dtypes
+    return pa.schema(
+        [
+            pa.field("location", pa.string()),
+            pa.field("created_at", pa.timestamp("ns", tz="UTC")),
+            *[
+                pa.field(column, pa.from_numpy_dtype(np.dtype(dtype)))
+                for column, dtype in dtypes.items()
+            ],
+        ]
+    )
+
+
+def write_csv(chunks, file):
+    header = True
+    for df in chunks:
+        df.to_csv(file, header=header, index=False)
+        header = False
+
+
+def write_parquet(chunks, file, schema: pa.Schema):
+    # one row group per chunk. an export without rows is still a valid file.
+    with pq.ParquetWriter(file, schema) as writer:
+        for df in chunks:
+            if df.empty:
+                continue
+            writer.write_table(
+                pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            )
+
+
+def export_measurements(
+    stores: dict, from_date, to_date, resolution: str, export_format: str
+) -> bytes:
+    # only one chunk of rows is in memory at a time, the encoded file is
+    # returned as a whole because st.download_button needs the complete data
+    file = io.BytesIO()
+    chunks = export_chunks(stores, from_date, to_date, resolution)
+    with instrumentation.span("export.write"):
+        if export_format == "CSV":
+            write_csv(chunks, file)
+        elif export_format == "Parquet":
+            write_parquet(chunks, file, export_schema(resolution))
+        else:
+            raise ValueError(f"Invalid export format {export_format}")
+    return file.getvalue()
@@ -0,0 +1,280 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# readings per insert request
+default_batch_size = 500
+default_retries = 5
+# seconds before the first retry, doubled for every further one
+default_backoff = 1
+
+
+class Reading(NamedTuple):
+    location: str
+    # ISO 8601 in UTC, together with location the key of a reading
+    created_at: str
+    temperature: float
+    humidity: float
+
+
+def utc_now() -> pd.Timestamp:
+    return pd.Timestamp.now(tz="UTC")
+
+
+# stand-in for a DHT-11 in a heated room: a daily temperature and humidity
+# cycle with noise at the sensor resolution, and failed reads now and then
+class SimulatedSensor:
+
+    def __init__(self, seed: int = None, failure_rate: float = 0.01):
+        self.rng = np.random.default_rng(seed)
+        self.failure_rate = failure_rate
+
+    def read(self, timestamp: pd.Timestamp):
+        # returns temperature and humidity, or None if the read failed
+        if self.rng.random() < self.failure_rate:
+            return None
+        day = (timestamp.hour * 60 + timestamp.minute) / 1440
+        daily = np.sin(2 * np.pi * (day - 0.375))
+        temperature = 20.5 + 1.5 * daily + self.rng.normal(0, 0.15)
+        humidity = 48 - 4 * daily + self.rng.normal(0, 1)
+        return round(temperature, 1), float(round(humidity))
+
+
+class DHT11Sensor:
+
+    def __init__(self, pin: str):
+        # only needed on the sensor nodes
+        import adafruit_dht
+        import board
+
+        self.device = adafruit_dht.DHT11(getattr(board, pin))
+
+    def read(self, timestamp: pd.Timestamp):
+        try:
+            temperature, humidity = self.device.temperature, self.device.humidity
+        except RuntimeError:
+            # checksum errors and timeouts are common, the next read retries
+            return None
+        if temperature is None or humidity is None:
+            return None
+        return float(temperature), float(humidity)
+
+
+# averages the readings of each minute into a single reading at the start of
+# the minute, so the measurements table holds one row per minute and the
+# dashboard's resampling to 1 minute has nothing left to do
+class MinuteAggregator:
+
+    def __init__(self, location: str):
+        self.location = location
+        self.minute = None
+        self.readings = []
+
+    def add(self, timestamp: pd.Timestamp, temperature: float, humidity: float):
+        # returns the readings of the completed minutes
+        minute = timestamp.floor("1min")
+        completed = []
+        if self.minute is not None and minute != self.minute:
+            completed = self.flush()
+        self.minute = minute
+        self.readings.append((temperature, humidity))
+        return completed
+
+    def flush(self):
+        # the current minute, even if it is not complete yet
+        if not self.readings:
+            return []
+        temperature, humidity = np.mean(self.readings, axis=0)
+        reading = Reading(
+            self.location,
+            self.minute.isoformat(),
+            round(float(temperature), 1),
+            round(float(humidity), 1),
+        )
+        self.readings = []
+        return [reading]
+
+
+# durable queue of the readings that have not been inserted yet, persisted in
+# sqlite so that nothing is lost when the node restarts or the network is down.
+# readings are keyed by location and created_at, so a reading that is queued
+# twice is only sent once.
+class ReadingQueue:
+
+    def __init__(self, path: str):
+        self.path = path
+        with sqlite3.connect(self.path) as connection:
+            # readings are safe once the transaction is committed
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS readings (
+                    location TEXT,
+                    created_at TEXT,
+                    temperature REAL,
+                    humidity REAL,
+                    PRIMARY KEY (location, created_at)
+                )
+                """
+            )
+
+    def __len__(self):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def put(self, readings: list):
+        with sqlite3.connect(self.path) as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?)", readings
+            )
+
+    def peek(self, limit: int) -> list:
+        # the oldest readings, they stay queued until they are removed
+        with sqlite3.connect(self.path) as connection:
+            rows = connection.execute(
+                "SELECT * FROM readings ORDER BY created_at LIMIT ?", (limit,)
+            ).fetchall()
+        return [Reading(*row) for row in rows]
+
+    def remove(self, readings: list):
+        with sqlite3.connect(self.path) as connection:
+            connection.executemany(
+                "DELETE FROM readings WHERE location = ? AND created_at = ?",
+                [(r.location, r.created_at) for r in readings],
+            )
+
+
+def insert_batch(client, readings: list):
+    # readings that are already in the table are skipped, so a batch whose
+    # response was lost can be sent again. needs the unique index of
+    # sql/ingestion.sql.
+    client.table("measurements").upsert(
+        [r._asdict() for r in readings],
+        on_conflict="location,created_at",
+        ignore_duplicates=True,
+    ).execute()
+
+
+def flush(
+    client,
+    queue: ReadingQueue,
+    batch_size: int = default_batch_size,
+    retries: int = default_retries,
+    backoff: float = default_backoff,
+) -> int:
+    # sends the queued readings in batches, returns the number of readings sent.
+    # failed batches are retried with exponential backoff and jitter, after the
+    # last retry the readings stay queued for the next flush.
+    sent = 0
+    while True:
+        readings = queue.peek(batch_size)
+        if not readings:
+            return sent
+        for attempt in range(retries + 1):
+            try:
+                insert_batch(client, readings)
+                break
+            except Exception as e:
+                if attempt == retries:
+                    print(f"Failed to insert {len(readings)} readings: {e}")
+                    return sent
+                delay = backoff * 2**attempt * random.uniform(0.5, 1.5)
+                print(f"Insert failed, retrying in {delay:.1f} s: {e}")
+                time.sleep(delay)
+        queue.remove(readings)
+        sent += len(readings)
+        if len(readings) < batch_size:
+            return sent
+
+
+def run(
+    client,
+    sensor,
+    queue: ReadingQueue,
+    location: str,
+    read_interval: float = 60,
+    flush_interval: float = 300,
+    minute_aggregates: bool = False,
+    batch_size: int = default_batch_size,
+):
+    # reads the sensor every read_interval seconds and flushes the queue every
+    # flush_interval seconds
+    aggregator = MinuteAggregator(location) if minute_aggregates else None
+    last_flush = time.monotonic()
+    try:
+        while True:
+            timestamp = utc_now()
+            values = sensor.read(timestamp)
+            if values is not None:
+                if aggregator is None:
+                    queue.put([Reading(location, timestamp.isoformat(), *values)])
+                else:
+                    queue.put(aggregator.add(timestamp, *values))
+            if time.monotonic() - last_flush >= flush_interval:
+                sent = flush(client, queue, batch_size=batch_size)
+                print(f"{location}: inserted {sent} readings, {len(queue)} queued")
+                last_flush = time.monotonic()
+            time.sleep(max(0, read_interval - (utc_now() - timestamp).total_seconds()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if aggregator is not None:
+            queue.put(aggregator.flush())
+        sent = flush(client, queue, batch_size=batch_size)
+        print(f"{location}: inserted {sent} readings, {len(queue)} queued")
+
+
+if __name__ == "__main__":
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(
+        description="Read a sensor and insert its readings in batches."
+    )
+    parser.add_argument("--location", required=True)
+    parser.add_argument(
+        "--sensor",
+        default="simulated",
+        help="'simulated' or the board pin of a DHT-11, e.g. D4.",
+    )
+    parser.add_argument("--queue", default="ingestion_queue.sqlite")
+    parser.add_argument("--read-interval", type=float, default=60)
+    parser.add_argument("--flush-interval", type=float, default=300)
+    parser.add_argument("--batch-size", type=int, default=default_batch_size)
+    parser.add_argument(
+        "--minute-aggregates",
+        action="store_true",
+        help="Insert the mean of each minute instead of every reading.",
+    )
+    parser.add_argument(
+        "--flush-only",
+        action="store_true",
+        help="Only insert the queued readings and exit.",
+    )
+    args = parser.parse_args()
+
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    queue = ReadingQueue(args.queue)
+    if args.flush_only:
+        sent = flush(client, queue, batch_size=args.batch_size)
+        print(f"Inserted {sent} readings, {len(queue)} queued")
+    else:
+        if args.sensor == "simulated":
+            sensor = SimulatedSensor()
+        else:
+            sensor = DHT11Sensor(args.sensor)
+        run(
+            client,
+            sensor,
+            queue,
+            args.location,
+            read_interval=args.read_interval,
+            flush_interval=args.flush_interval,
+            minute_aggregates=args.minute_aggregates,
+            batch_size=args.batch_size,
+        )
@@ -0,0 +1,121 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# profile of the current script run or fragment run. worker threads do not
+# inherit it, so map_concurrently activates it in its threads. without an
+# active profile spans and counters are no-ops.
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+# timing spans and counters (rows fetched, bytes transferred, cache hits and
+# misses, ...) collected during one run of the dashboard
+class Profile:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = pd.Timestamp.utcnow()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+        # open spans per thread, for the nesting depth
+        self.stacks = threading.local()
+
+    @property
+    def finished(self) -> bool:
+        return self.duration is not None
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    @contextmanager
+    def span(self, name: str):
+        stack = self.stacks.__dict__.setdefault("stack", [])
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            with self.lock:
+                self.spans.append(
+                    {
+                        "name": name,
+                        "depth": len(stack),
+                        "thread": threading.current_thread().name,
+                        "start_ms": (start - self.start) * 1000,
+                        "duration_ms": (end - start) * 1000,
+                    }
+                )
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def spans_frame(self) -> pd.DataFrame:
+        # spans in the order they were started, indented by depth
+        df = pd.DataFrame(
+            self.spans,
+            columns=["name", "depth", "thread", "start_ms", "duration_ms"],
+        )
+        df = df.sort_values("start_ms", kind="stable").reset_index(drop=True)
+        df["name"] = [
+            "  " * depth + name for name, depth in zip(df["name"], df["depth"])
+        ]
+        return df.drop(columns="depth")
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "name": self.name,
+                "started_at": self.started_at.isoformat(),
+                "duration_ms": None if self.duration is None else self.duration * 1000,
+                "spans": list(self.spans),
+                "counters": dict(self.counters),
+            }
+
+    def write_log(self, path: str):
+        # one json object per run, appended to path
+        with open(path, "a") as f:
+            f.write(json.dumps(self.to_dict()) + "\n")
+
+
+def start_profile(name: str) -> Profile:
+    profile = Profile(name)
+    current_profile.set(profile)
+    return profile
+
+
+def active_profile():
+    profile = current_profile.get()
+    if profile is None or profile.finished:
+        return None
+    return profile
+
+
+@contextmanager
+def span(name: str):
+    profile = active_profile()
+    if profile is None:
+        yield
+        return
+    with profile.span(name):
+        yield
+
+
+def count(name: str, value: int = 1):
+    profile = active_profile()
+    if profile is not None:
+        profile.count(name, value)
+
+
+def enabled() -> bool:
+    # for counters that are expensive to compute
+    return active_profile() is not None
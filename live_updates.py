@@ -0,0 +1,48 @@
+import threading
+
+import pandas as pd
+
+
+# in-process publisher of new measurements, fed by the measurement stores with
+# every row they add. subscribers are called with the location and the new
+# measurements.
+class MeasurementPublisher:
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, location: str, df: pd.DataFrame):
+        if df.empty:
+            return
+        for callback in self.subscribers:
+            callback(location, df)
+
+
+# single background thread per process that polls the new measurements of all
+# locations in one batched snapshot request. it stands in for a database push
+# channel, so each new measurement is fetched once per process no matter how
+# many sessions are open. the measurement stores publish the rows they add.
+class MeasurementPoller(threading.Thread):
+
+    def __init__(self, snapshot, poll_interval: float = 10):
+        super().__init__(daemon=True)
+        self.snapshot = snapshot
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+
+    def poll(self):
+        try:
+            self.snapshot.refresh(force=True)
+        except Exception as e:
+            # the next poll retries, meanwhile the sessions refresh the stores
+            print(f"Failed to poll: {e}")
+
+    def run(self):
+        while not self.stopped.wait(self.poll_interval):
+            self.poll()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,312 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from cleaning import reject_outliers
+
+measurement_columns = ["created_at", "temperature", "humidity"]
+# the sensor resolution is 0.1 °C and 1 %, so float32 loses nothing and halves
+# the memory of the long-lived caches
+measurement_dtypes = {"temperature": "float32", "humidity": "float32"}
+# PostgREST caps responses at 1000 rows by default
+default_page_size = 1000
+
+
+def to_utc(timestamp) -> pd.Timestamp:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
+def fetch_measurements(
+    client,
+    location: str,
+    from_date=None,
+    after=None,
+    before=None,
+    page_size: int = default_page_size,
+) -> pd.DataFrame:
+    # keyset pagination on created_at: each page continues after the last
+    # timestamp of the previous one, so no page is skipped by the row limit.
+    # every page is converted to columnar arrays right away and the raw rows are
+    # dropped, so peak memory is the result plus a single page.
+    created_at, temperature, humidity = [], [], []
+    last_seen = None if after is None else to_utc(after).isoformat()
+    while True:
+        query = (
+            client.table("measurements")
+            .select(",".join(measurement_columns))
+            .eq("location", location)
+        )
+        if last_seen is not None:
+            query = query.gt("created_at", last_seen)
+        elif from_date is not None:
+            query = query.gte("created_at", to_utc(from_date).isoformat())
+        if before is not None:
+            query = query.lt("created_at", to_utc(before).isoformat())
+        with instrumentation.span("supabase.fetch_measurements"):
+            page = query.order("created_at").limit(page_size).execute().data
+        instrumentation.count("supabase_requests")
+        instrumentation.count("rows_fetched", len(page))
+        if instrumentation.enabled():
+            # size of the json payload, the client does not expose the response
+            instrumentation.count("bytes_fetched", len(json.dumps(page)))
+        if not page:
+            break
+
+        # postgrest omits the fraction of whole seconds, so the format differs
+        # between rows and has to be parsed as ISO8601 instead of inferred
+        created_at.append(
+            pd.to_datetime(
+                [row["created_at"] for row in page], utc=True, format="ISO8601"
+            ).values
+        )
+        temperature.append(
+            np.array([row["temperature"] for row in page], np.float32)
+        )
+        humidity.append(np.array([row["humidity"] for row in page], np.float32))
+        last_seen = page[-1]["created_at"]
+        if len(page) < page_size:
+            break
+
+    if not created_at:
+        return empty_measurements()
+    return pd.DataFrame(
+        {
+            "created_at": pd.DatetimeIndex(np.concatenate(created_at)).tz_localize(
+                "UTC"
+            ),
+            "temperature": np.concatenate(temperature),
+            "humidity": np.concatenate(humidity),
+        }
+    )
+
+
+def empty_measurements() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "created_at": pd.Series(dtype="datetime64[ns, UTC]"),
+            "temperature": pd.Series(dtype="float32"),
+            "humidity": pd.Series(dtype="float32"),
+        }
+    )
+
+
+def compact_measurements(df: pd.DataFrame) -> pd.DataFrame:
+    # measurements of older archives and rows parsed by pandas are float64
+    return df.astype(measurement_dtypes, copy=False)
+
+
+# append-only in-process cache of the measurements of a single location. the
+# store covers the contiguous window [start, last_timestamp]: newer rows are
+# pulled with a created_at > last_seen delta query at most every
+# refresh_interval seconds, older rows are backfilled once when a range reaching
+# further back is requested. with an archive, rows older than archived_until are
+# read from the local archive instead of the database, and without a client the
+# store is served from the archive alone. glitches of the sensor are rejected as
+# the rows are added, so everything served from the store is cleaned. every row
+# that is added, no matter by which path, is passed to on_new(location, rows).
+class MeasurementStore:
+
+    def __init__(
+        self,
+        client,
+        location: str,
+        refresh_interval: float = 60,
+        page_size: int = default_page_size,
+        archive=None,
+        on_new=None,
+    ):
+        self.client = client
+        self.archive = archive
+        self.on_new = on_new
+        self.location = location
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.df = empty_measurements()
+        self.start = None
+        self.last_refresh = None
+        self.lock = threading.RLock()
+        self.backfill_lock = threading.Lock()
+
+    def _added(self, df: pd.DataFrame):
+        # called with the lock held, so the rows are passed on in the order
+        # they were added
+        if self.on_new is not None and not df.empty:
+            self.on_new(self.location, df)
+
+    def _fetch(self, from_date=None, after=None, before=None) -> pd.DataFrame:
+        frames = []
+        archived_until = (
+            None if self.archive is None else self.archive.archived_until(self.location)
+        )
+        if (
+            archived_until is not None
+            and from_date is not None
+            and to_utc(from_date) < archived_until
+        ):
+            # rows of archived months are read locally, only the rest is queried
+            if before is not None:
+                archived_until = min(to_utc(before), archived_until)
+            frames.append(self.archive.read(self.location, from_date, archived_until))
+            from_date = archived_until
+        if self.client is not None and (before is None or from_date < before):
+            # the store is the cache, so the queries are executed directly
+            # instead of going through execute_query
+            frames.append(
+                fetch_measurements(
+                    self.client,
+                    self.location,
+                    from_date=from_date,
+                    after=after,
+                    before=before,
+                    page_size=self.page_size,
+                )
+            )
+        if not frames:
+            return empty_measurements()
+        return compact_measurements(pd.concat(frames, ignore_index=True))
+
+    def _fetch_latest(self) -> pd.DataFrame:
+        if self.client is None:
+            return compact_measurements(self.archive.latest(self.location))
+        with instrumentation.span("supabase.fetch_latest"):
+            latest = (
+                self.client.table("measurements")
+                .select(",".join(measurement_columns))
+                .eq("location", self.location)
+                .order("created_at", desc=True)
+                .limit(1)
+                .execute()
+                .data
+            )
+        instrumentation.count("supabase_requests")
+        instrumentation.count("rows_fetched", len(latest))
+        df = pd.DataFrame(latest, columns=measurement_columns)
+        df["created_at"] = pd.to_datetime(df["created_at"], utc=True, format="ISO8601")
+        return compact_measurements(df)
+
+    @property
+    def last_timestamp(self):
+        if self.df.empty:
+            return None
+        return self.df["created_at"].iloc[-1]
+
+    def refresh(self, force: bool = False) -> pd.DataFrame:
+        # returns the new measurements
+        with self.lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self.last_refresh is not None
+                and now - self.last_refresh < self.refresh_interval
+            ):
+                return empty_measurements()
+            self.last_refresh = now
+
+            if self.df.empty:
+                # nothing cached yet, only get the latest measurement so that
+                # the requested windows can be computed relative to it
+                new = self._fetch_latest()
+                if not new.empty:
+                    self.start = new["created_at"].iloc[0]
+            else:
+                new = self._fetch(after=self.last_timestamp)
+            if not new.empty:
+                new = reject_outliers(new, context=self.df)
+                self.df = pd.concat([self.df, new], ignore_index=True)
+                self._added(new)
+            return new
+
+    def extend(self, new: pd.DataFrame, start=None) -> pd.DataFrame:
+        # add measurements fetched elsewhere, e.g. by a batched query, and count
+        # it as a refresh. if nothing is cached yet, new covers the window from
+        # start on. returns the new measurements like refresh does.
+        with self.lock:
+            self.last_refresh = time.monotonic()
+            if new.empty:
+                return new
+            if self.df.empty:
+                first = new["created_at"].iloc[0]
+                self.start = first if start is None else min(to_utc(start), first)
+                self.df = reject_outliers(new)
+                self._added(self.df)
+                # like refresh, only the latest measurement is new to a store
+                # that had nothing cached
+                return self.df.iloc[-1:]
+            new = new[new["created_at"] > self.last_timestamp]
+            if not new.empty:
+                new = reject_outliers(new, context=self.df)
+                self.df = pd.concat([self.df, new], ignore_index=True)
+                self._added(new)
+            return new
+
+    def covers(self, from_date) -> bool:
+        with self.lock:
+            return self.start is not None and from_date >= self.start
+
+    def backfill(self, from_date):
+        from_date = to_utc(from_date)
+        if self.covers(from_date):
+            instrumentation.count("measurement_store_hits")
+            return
+        # one backfill at a time. the older rows are fetched without holding
+        # the lock, so refreshes and reads of the covered window are not
+        # blocked by a long backfill.
+        with self.backfill_lock:
+            with self.lock:
+                if self.covers(from_date):
+                    # backfilled while waiting for the lock
+                    instrumentation.count("measurement_store_hits")
+                    return
+                instrumentation.count("measurement_store_misses")
+                before = self.start
+                if before is None:
+                    # nothing cached, so there is nothing to keep unblocked
+                    self.df = reject_outliers(self._fetch(from_date=from_date))
+                    self.start = from_date
+                    self._added(self.df)
+                    return
+            # the first cached rows keep the result of their shorter windows
+            old = reject_outliers(self._fetch(from_date=from_date, before=before))
+            with self.lock:
+                self.df = pd.concat([old, self.df], ignore_index=True)
+                self.start = from_date
+                self._added(old)
+
+    def load(self, from_date):
+        # make sure the store is up to date and covers from_date
+        self.refresh()
+        self.backfill(from_date)
+
+    def read(self, from_date, before, context=None) -> pd.DataFrame:
+        # measurements of [from_date, before) without adding them to the store,
+        # to read long ranges chunk by chunk. rows the store covers are sliced
+        # from it, others are fetched and cleaned with context, the rows before
+        # from_date.
+        from_date, before = to_utc(from_date), to_utc(before)
+        with self.lock:
+            df = self.df
+            covered = self.covers(from_date)
+        if covered:
+            start = df["created_at"].searchsorted(from_date, side="left")
+            end = df["created_at"].searchsorted(before, side="left")
+            return df.iloc[start:end]
+        return reject_outliers(
+            self._fetch(from_date=from_date, before=before), context=context
+        )
+
+    def get(self, from_date, to_date) -> pd.DataFrame:
+        self.load(from_date)
+        from_date, to_date = to_utc(from_date), to_utc(to_date)
+        df = self.df
+        # df is sorted, so the range is a slice instead of a boolean mask over
+        # all rows. the index is not reset to avoid another copy.
+        start = df["created_at"].searchsorted(from_date, side="left")
+        end = df["created_at"].searchsorted(to_date, side="right")
+        return df.iloc[start:end]
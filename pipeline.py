@@ -0,0 +1,270 @@
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import pandas as pd
+
+import instrumentation
+from charts import prepare_chart_data
+from cleaning import gap_threshold, split_segments
+from cube import HourlyCube
+from measurement_store import MeasurementStore, to_utc
+from processing import add_sunrise_sunset_markers
+from rolling import RollingMeans
+from rollups import RollupStore, pick_resolution, resolutions
+from statistics_index import StatisticsIndex
+
+
+class RangeSpec(NamedTuple):
+    from_date: pd.Timestamp
+    to_date: pd.Timestamp
+    # rolling average in minutes
+    rolling_average: int
+    resolution: str
+
+
+# everything the dashboard shows for one location and range. view models are
+# shared between sessions and must not be modified.
+class ViewModel(NamedTuple):
+    # resampled measurements with rolling means and sunrise/sunset markers
+    df: pd.DataFrame
+    # df reduced to the chart columns and points
+    chart_data: pd.DataFrame
+    statistics: dict
+    latest_temperature: float
+    latest_humidity: float
+    sunrise_sunset: pd.DataFrame
+
+
+def make_range_spec(
+    from_date, to_date, rolling_average: int, max_points: int
+) -> RangeSpec:
+    from_date, to_date = to_utc(from_date), to_utc(to_date)
+    # the finest resolution that keeps the chart at max_points
+    resolution = pick_resolution(from_date, to_date, max_points=max_points)
+    return RangeSpec(from_date, to_date, rolling_average, resolution)
+
+
+def last_valid(series: pd.Series) -> float:
+    # the latest reading may have been rejected
+    index = series.last_valid_index()
+    return float("nan") if index is None else series[index]
+
+
+def process_range(
+    resampled: pd.DataFrame,
+    measurements: pd.DataFrame,
+    statistics: dict,
+    df_sunrise_sunset: pd.DataFrame,
+    spec: RangeSpec,
+    chart_points: int = None,
+) -> ViewModel:
+    # measurements are the cleaned raw measurements up to to_date, the live
+    # values are their latest readings and not the last bucket of resampled.
+    # now that the rolling means are computed, drop the measurements before
+    # from_date that were only needed for the first windows. resampled is
+    # sorted, so they are a leading slice, and only copied if there are any.
+    start = resampled["created_at"].searchsorted(spec.from_date)
+    df = resampled.iloc[start:].reset_index(drop=True) if start else resampled
+    # consecutive buckets are one bucket apart, only missing ones make a gap
+    max_gap = max(gap_threshold, pd.Timedelta(minutes=resolutions[spec.resolution]))
+    df = split_segments(df, max_gap)
+    with instrumentation.span("sunrise_sunset_markers"):
+        df = add_sunrise_sunset_markers(df, df_sunrise_sunset)
+    # only the needed columns are sent, downsampled to chart_points per series.
+    # the markers are always kept, the chart drops them if they are not shown.
+    with instrumentation.span("prepare_chart_data"):
+        chart_data = prepare_chart_data(
+            df, max_points=chart_points, sunrise_sunset=True
+        )
+    return ViewModel(
+        df=df,
+        chart_data=chart_data,
+        statistics=statistics,
+        latest_temperature=last_valid(measurements["temperature"]),
+        latest_humidity=last_valid(measurements["humidity"]),
+        sunrise_sunset=df_sunrise_sunset,
+    )
+
+
+# the processing of a single location, independent of streamlit sessions. the
+# view model of each range spec is computed once and shared by all viewers, and
+# since the range ends at the latest measurement, a new one is computed when a
+# new measurement arrives. get_sunrise_sunset(date_start, date_end) returns the
+# sunrise and sunset times of the location.
+class LocationPipeline:
+
+    def __init__(
+        self,
+        store: MeasurementStore,
+        rollup_store: RollupStore,
+        get_sunrise_sunset,
+        chart_points: int = None,
+        max_views: int = 32,
+    ):
+        self.store = store
+        self.rollup_store = rollup_store
+        self.get_sunrise_sunset = get_sunrise_sunset
+        self.chart_points = chart_points
+        self.max_views = max_views
+        self.rolling_means = RollingMeans()
+        self.statistics_index = StatisticsIndex()
+        self.cube = HourlyCube()
+        self.views = OrderedDict()
+        # guards views and spec_locks, the locks of the specs that are being
+        # computed
+        self.lock = threading.Lock()
+        self.spec_locks = {}
+        # views of different specs are computed concurrently, but the shared
+        # statistics index and cube are updated by one of them at a time
+        self.update_lock = threading.Lock()
+
+    def fetch_rollup(self, from_date, to_date, resolution: str) -> pd.DataFrame:
+        # long ranges are served from the rollups, only the measurements that
+        # are not covered by the rollup job yet are fetched and aggregated on
+        # the fly
+        covered_until = self.rollup_store.covered_until(resolution)
+        from_date_raw = to_utc(from_date)
+        if covered_until is not None:
+            from_date_raw = max(from_date_raw, covered_until)
+        raw = self.store.get(from_date_raw, to_date)
+        return self.rollup_store.get(from_date, to_date, resolution, raw)
+
+    def fetch_resampled(self, spec: RangeSpec) -> pd.DataFrame:
+        # the rolling mean needs the measurements of one window before from_date
+        from_date_fetch = spec.from_date - pd.Timedelta(minutes=spec.rolling_average)
+
+        if spec.resolution == "1min":
+            # served from the shared rolling means, which only process new rows
+            self.store.load(from_date_fetch)
+            self.rolling_means.update(self.store.df)
+            return self.rolling_means.get(
+                spec.from_date, spec.to_date, window=spec.rolling_average
+            )
+
+        df = self.fetch_rollup(from_date_fetch, spec.to_date, spec.resolution)
+        # the rolling window is given in minutes and converted to the number of
+        # buckets
+        window = max(1, spec.rolling_average // resolutions[spec.resolution])
+        for column in ["temperature", "humidity"]:
+            df[f"{column}_mean"] = (
+                df[column].rolling(window=window, min_periods=window // 2).mean()
+            )
+        return df
+
+    def update_statistics_index(self, from_day):
+        # extend the index back to from_day and bring it up to date, only the
+        # days that are not indexed yet and the last indexed day are computed
+        with self.update_lock:
+            self._update_statistics_index(from_day)
+
+    def _update_statistics_index(self, from_day):
+        self.store.refresh()
+        last_timestamp = self.store.last_timestamp
+        if last_timestamp is None:
+            return
+        index = self.statistics_index
+        if index.start is not None and from_day < index.start:
+            minutes = self.fetch_rollup(from_day, index.start, "1min")
+            index.update(minutes[minutes["created_at"] < index.start], start=from_day)
+        update_from = index.update_from or from_day
+        index.update(
+            self.fetch_rollup(update_from, last_timestamp, "1min"), start=update_from
+        )
+
+    def statistics(self, spec: RangeSpec) -> dict:
+        # the full days of the range are served from the index, so it only has
+        # to cover them. a range without full days is computed from its minutes.
+        first_day = spec.from_date.ceil("1D")
+        end_day = (spec.to_date.floor("1min") + pd.Timedelta(minutes=1)).floor("1D")
+        if first_day < end_day:
+            self.update_statistics_index(first_day)
+        return self.statistics_index.get(
+            spec.from_date,
+            spec.to_date,
+            lambda edge_start, edge_end: self.fetch_rollup(
+                edge_start, edge_end, "1min"
+            ),
+        )
+
+    def update_cube(self, from_hour):
+        # extend the cube back to from_hour and bring it up to date, only the
+        # hours that are not in the cube yet and the last hour are computed
+        with self.update_lock:
+            self.store.refresh()
+            last_timestamp = self.store.last_timestamp
+            if last_timestamp is None:
+                return
+            cube_start = self.cube.start
+            if cube_start is not None and from_hour < cube_start:
+                self.cube.update(
+                    self.fetch_rollup(from_hour, cube_start, "1h"), start=from_hour
+                )
+            update_from = self.cube.update_from or from_hour
+            self.cube.update(
+                self.fetch_rollup(update_from, last_timestamp, "1h"), start=update_from
+            )
+
+    def heatmap(self, spec: RangeSpec) -> pd.DataFrame:
+        with instrumentation.span("heatmap"):
+            self.update_cube(spec.from_date.floor("1h"))
+            return self.cube.heatmap(spec.from_date, spec.to_date)
+
+    def calendar(self, spec: RangeSpec) -> pd.DataFrame:
+        with instrumentation.span("calendar"):
+            self.update_cube(spec.from_date.floor("1h"))
+            return self.cube.calendar(spec.from_date, spec.to_date)
+
+    def cached_view(self, spec: RangeSpec):
+        with self.lock:
+            view = self.views.get(spec)
+            if view is not None:
+                instrumentation.count("view_cache_hits")
+                self.views.move_to_end(spec)
+            return view
+
+    def view(self, spec: RangeSpec) -> ViewModel:
+        # concurrent viewers of the same spec wait for a single computation,
+        # viewers of other specs are not blocked by it
+        view = self.cached_view(spec)
+        if view is not None:
+            return view
+        with self.lock:
+            spec_lock = self.spec_locks.setdefault(spec, threading.Lock())
+        with spec_lock:
+            # computed while waiting for the lock
+            view = self.cached_view(spec)
+            if view is not None:
+                return view
+            instrumentation.count("view_cache_misses")
+
+            with instrumentation.span("fetch_resampled"):
+                resampled = self.fetch_resampled(spec)
+            # count, mean, std, min, max and percentiles from the per-day index
+            with instrumentation.span("statistics"):
+                statistics = self.statistics(spec)
+            with instrumentation.span("sunrise_sunset"):
+                df_sunrise_sunset = self.get_sunrise_sunset(
+                    spec.from_date.strftime("%Y-%m-%d"),
+                    spec.to_date.strftime("%Y-%m-%d"),
+                )
+            # the store covers the latest measurements, new ones after
+            # to_date belong to the next view
+            measurements = self.store.df
+            end = measurements["created_at"].searchsorted(spec.to_date, side="right")
+            view = process_range(
+                resampled,
+                measurements.iloc[:end],
+                statistics,
+                df_sunrise_sunset,
+                spec,
+                chart_points=self.chart_points,
+            )
+
+            with self.lock:
+                self.views[spec] = view
+                while len(self.views) > self.max_views:
+                    self.views.popitem(last=False)
+                # later viewers find the view in the cache
+                del self.spec_locks[spec]
+        return view
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+sunrise_sunset_events = ["Sunrise", "Sunset"]
+
+
+def add_sunrise_sunset_markers(
+    df: pd.DataFrame, df_sunrise_sunset: pd.DataFrame
+) -> pd.DataFrame:
+    # find the closest measurement in df to each sunrise and sunset and set them
+    # to 1, else set them to 0. all events are looked up at once with a binary
+    # search over the sorted created_at column instead of a full scan per event.
+    # .values of a tz-aware column are the UTC times, so no converted copies are
+    # needed for the comparison.
+    times = df["created_at"].values
+    events = np.column_stack(
+        [df_sunrise_sunset[key].values for key in ["sunrise", "sunset"]]
+    ).ravel()
+    # codes into sunrise_sunset_events
+    event_codes = np.tile(
+        np.arange(len(sunrise_sunset_events), dtype=np.int8), len(df_sunrise_sunset)
+    )
+
+    sunrise_sunset = np.zeros(len(df), dtype=np.int8)
+    sunrise_sunset_type = np.full(len(df), -1, dtype=np.int8)
+    if len(times) and len(events):
+        right = np.searchsorted(times, events).clip(0, len(times) - 1)
+        left = (right - 1).clip(0)
+        # on a tie the earlier measurement wins, like idxmin would
+        nearest = np.where(
+            events - times[left] <= times[right] - events, left, right
+        )
+        # if several events map to the same measurement the latest one wins
+        markers = pd.Series(event_codes, index=nearest)
+        markers = markers[~markers.index.duplicated(keep="last")]
+        sunrise_sunset[markers.index] = 1
+        sunrise_sunset_type[markers.index] = markers.to_numpy()
+
+    # remove the first sunset, sunrise indicators from the measurement
+    # sunrise_sunset column as they are not accurate
+    df["sunrise_sunset"] = np.append(sunrise_sunset[1:], np.int8(0))[: len(df)]
+    df["sunrise_sunset_type"] = pd.Categorical.from_codes(
+        np.append(sunrise_sunset_type[1:], np.int8(-1))[: len(df)],
+        categories=sunrise_sunset_events,
+    )
+    return df
@@ -0,0 +1,160 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from measurement_store import to_utc
+
+rolling_columns = ["temperature", "humidity"]
+
+
+# growable array with amortized O(1) appends
+class Buffer:
+
+    def __init__(self, dtype=float, capacity: int = 1024):
+        self.values = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.values[: self.size][index]
+
+    def truncate(self, size: int):
+        self.size = min(self.size, size)
+
+    def extend(self, values: np.ndarray):
+        if self.size + len(values) > len(self.values):
+            capacity = max(2 * len(self.values), self.size + len(values))
+            values_ = np.empty(capacity, dtype=self.values.dtype)
+            values_[: self.size] = self.values[: self.size]
+            self.values = values_
+        self.values[self.size : self.size + len(values)] = values
+        self.size += len(values)
+
+    def prepend(self, values: np.ndarray):
+        # O(size), for the rare extensions of a buffer back in time
+        values_ = np.empty(
+            max(len(self.values), self.size + len(values)), dtype=self.values.dtype
+        )
+        values_[: len(values)] = values
+        values_[len(values) : len(values) + self.size] = self.values[: self.size]
+        self.values = values_
+        self.size += len(values)
+
+
+# rolling means of the measurements of a single location on the 1 minute grid.
+# the running sums and counts of the grid are kept, so new measurements are
+# added in O(new rows) and the rolling mean for any window size (5 min, 1 h,
+# 6 h, 1 day, 7 days, ...) is a difference of two running sums.
+class RollingMeans:
+
+    def __init__(self):
+        self.start = None
+        self.values = {column: Buffer(dtype=np.float32) for column in rolling_columns}
+        # running sums and counts of the non-NaN values, with a leading zero.
+        # the sums stay float64 to keep their precision over years of minutes.
+        self.sums = {column: Buffer() for column in rolling_columns}
+        self.counts = {column: Buffer(dtype=np.int32) for column in rolling_columns}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values[rolling_columns[0]])
+
+    def clear(self, start: pd.Timestamp):
+        self.start = start
+        for column in rolling_columns:
+            self.values[column].truncate(0)
+            self.sums[column].truncate(0)
+            self.counts[column].truncate(0)
+            self.sums[column].extend(np.zeros(1))
+            self.counts[column].extend(np.zeros(1, dtype=np.int32))
+
+    @property
+    def last_minute(self):
+        if self.start is None or len(self) == 0:
+            return None
+        return self.start + pd.Timedelta(minutes=len(self) - 1)
+
+    def update(self, df: pd.DataFrame):
+        # df are the sorted measurements of the location, usually the df of its
+        # MeasurementStore
+        with self.lock, instrumentation.span("rolling.update"):
+            if df.empty:
+                return
+            first_minute = df["created_at"].iloc[0].floor("1min")
+            if self.start is None or first_minute < self.start:
+                # older measurements were backfilled, rebuild the grid
+                self.clear(first_minute)
+                new = df
+            else:
+                # the last minute may have received more measurements, so it is
+                # recomputed together with the new ones
+                last_minute = self.last_minute
+                if last_minute is not None:
+                    index = len(self) - 1
+                    for column in rolling_columns:
+                        self.values[column].truncate(index)
+                        self.sums[column].truncate(index + 1)
+                        self.counts[column].truncate(index + 1)
+                    position = df["created_at"].searchsorted(last_minute)
+                    new = df.iloc[position:]
+                else:
+                    new = df
+            if new.empty:
+                return
+
+            # resample data to 1 minute intervals and use the latest value
+            new = new.resample("1min", on="created_at").last()
+            # fill the gap between the last known minute and the new measurements
+            grid_start = self.start + pd.Timedelta(minutes=len(self))
+            new = new.reindex(
+                pd.date_range(grid_start, new.index[-1], freq="1min")
+            )
+
+            for column in rolling_columns:
+                values = new[column].to_numpy(dtype=float)
+                valid = ~np.isnan(values)
+                self.values[column].extend(values)
+                self.sums[column].extend(
+                    self.sums[column][-1] + np.cumsum(np.where(valid, values, 0))
+                )
+                self.counts[column].extend(
+                    self.counts[column][-1] + np.cumsum(valid)
+                )
+
+    def get(self, from_date, to_date, window: int) -> pd.DataFrame:
+        # same result as resampling to 1 minute intervals and computing
+        # .rolling(window=window, min_periods=window // 2).mean(), restricted to
+        # [from_date, to_date]
+        with self.lock, instrumentation.span("rolling.get"):
+            if self.start is None or len(self) == 0:
+                return pd.DataFrame(
+                    columns=["created_at"]
+                    + rolling_columns
+                    + [f"{column}_mean" for column in rolling_columns]
+                )
+            minute = pd.Timedelta(minutes=1)
+            first = max(-((self.start - to_utc(from_date)) // minute), 0)
+            last = min((to_utc(to_date) - self.start) // minute, len(self) - 1)
+            index = np.arange(first, last + 1)
+            df = pd.DataFrame(
+                {
+                    "created_at": self.start
+                    + pd.to_timedelta(index, unit="min"),
+                }
+            )
+            # position of the start of the window in the running sums
+            window_start = (index + 1 - window).clip(0)
+            for column in rolling_columns:
+                sums, counts = self.sums[column], self.counts[column]
+                count = counts[index + 1] - counts[window_start]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    mean = (sums[index + 1] - sums[window_start]) / count
+                df[column] = self.values[column][index]
+                df[f"{column}_mean"] = np.where(
+                    (count >= window // 2) & (count > 0), mean, np.nan
+                )
+            return df
@@ -0,0 +1,168 @@
+import argparse
+import os
+import threading
+
+import pandas as pd
+
+import instrumentation
+from measurement_store import MeasurementStore, to_utc
+
+# resolution name -> bucket size in minutes, ordered from finest to coarsest
+resolutions = {"1min": 1, "15min": 15, "1h": 60, "1d": 1440}
+default_max_points = 2000
+rollup_dtypes = {
+    "temperature": "float32",
+    "temperature_min": "float32",
+    "temperature_max": "float32",
+    "humidity": "float32",
+    "humidity_min": "float32",
+    "humidity_max": "float32",
+    "count": "int32",
+}
+
+
+def pick_resolution(from_date, to_date, max_points: int = default_max_points) -> str:
+    # finest resolution that keeps the chart at or below max_points, so that the
+    # number of points is bounded no matter how long the range is
+    minutes = (to_utc(to_date) - to_utc(from_date)).total_seconds() / 60
+    for resolution, bucket_minutes in resolutions.items():
+        if minutes / bucket_minutes <= max_points:
+            return resolution
+    return resolution
+
+
+def compute_rollup(df: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    # min/mean/max aggregates per bucket, empty buckets are kept as NaN rows so
+    # that gaps in the recording stay visible in the chart
+    if df.empty:
+        return pd.DataFrame(
+            {"created_at": pd.Series(dtype="datetime64[ns, UTC]")}
+        ).assign(
+            **{
+                column: pd.Series(dtype=dtype)
+                for column, dtype in rollup_dtypes.items()
+            }
+        )
+    with instrumentation.span("rollups.compute"):
+        rollup = df.resample(resolution, on="created_at").agg(
+            temperature=("temperature", "mean"),
+            temperature_min=("temperature", "min"),
+            temperature_max=("temperature", "max"),
+            humidity=("humidity", "mean"),
+            humidity_min=("humidity", "min"),
+            humidity_max=("humidity", "max"),
+            count=("temperature", "count"),
+        )
+    return rollup.astype(rollup_dtypes).reset_index()
+
+
+# rollups of a single location, persisted as one parquet file per resolution.
+# the last stored bucket may be incomplete, so it is always recomputed from the
+# raw measurements when updating or reading.
+class RollupStore:
+
+    def __init__(self, directory: str, location: str):
+        self.directory = os.path.join(directory, location)
+        self.location = location
+        self.rollups = {}
+        self.lock = threading.Lock()
+
+    def path(self, resolution: str) -> str:
+        return os.path.join(self.directory, f"{resolution}.parquet")
+
+    def load(self, resolution: str):
+        path = self.path(resolution)
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self.rollups.get(resolution)
+            # reload if the rollup job has written the file since the last read
+            if cached is None or cached[0] != mtime:
+                instrumentation.count("rollup_cache_misses")
+                with instrumentation.span("rollups.read"):
+                    rollup = pd.read_parquet(path)
+                # files written before the float32 columns are converted once
+                cached = (mtime, rollup.astype(rollup_dtypes, copy=False))
+                self.rollups[resolution] = cached
+            else:
+                instrumentation.count("rollup_cache_hits")
+        return cached[1]
+
+    def covered_until(self, resolution: str):
+        # start of the last stored bucket, raw measurements are needed from here
+        rollup = self.load(resolution)
+        if rollup is None or rollup.empty:
+            return None
+        return rollup["created_at"].iloc[-1]
+
+    def fetch_since(self):
+        # raw measurements needed to bring all resolutions up to date
+        covered = [self.covered_until(resolution) for resolution in resolutions]
+        if any(c is None for c in covered):
+            return None
+        return min(covered)
+
+    def _combine(
+        self, resolution: str, raw: pd.DataFrame, from_date=None
+    ) -> pd.DataFrame:
+        rollup = self.load(resolution)
+        tail_start = self.covered_until(resolution)
+        if tail_start is None:
+            return compute_rollup(raw, resolution)
+        # the stored rollups are sorted, so only the needed slice is copied
+        start = 0 if from_date is None else rollup["created_at"].searchsorted(from_date)
+        end = rollup["created_at"].searchsorted(tail_start)
+        tail = compute_rollup(raw[raw["created_at"] >= tail_start], resolution)
+        if tail.empty:
+            return rollup.iloc[start:end].reset_index(drop=True)
+        return pd.concat([rollup.iloc[start:end], tail], ignore_index=True)
+
+    def update(self, raw: pd.DataFrame):
+        os.makedirs(self.directory, exist_ok=True)
+        for resolution in resolutions:
+            rollup = self._combine(resolution, raw)
+            path = self.path(resolution)
+            # write to a temporary file first so readers never see partial files
+            rollup.to_parquet(f"{path}.tmp", index=False)
+            os.replace(f"{path}.tmp", path)
+
+    def get(self, from_date, to_date, resolution: str, raw: pd.DataFrame):
+        # raw has to contain the measurements from covered_until(resolution) on
+        from_date = to_utc(from_date).floor(resolution)
+        to_date = to_utc(to_date)
+        rollup = self._combine(resolution, raw, from_date=from_date)
+        mask = (rollup["created_at"] >= from_date) & (rollup["created_at"] <= to_date)
+        return rollup.loc[mask].reset_index(drop=True)
+
+
+def update_rollups(client, directory: str, since: str):
+    locations = client.table("locations").select("location").execute().data
+    for location in [l["location"] for l in locations]:
+        rollup_store = RollupStore(directory, location)
+        from_date = rollup_store.fetch_since() or since
+        store = MeasurementStore(client, location)
+        store.refresh()
+        if store.last_timestamp is None:
+            continue
+        raw = store.get(from_date, store.last_timestamp)
+        rollup_store.update(raw)
+        print(f"{location}: aggregated {len(raw)} measurements since {from_date}")
+
+
+if __name__ == "__main__":
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(
+        description="Update the min/mean/max rollups of all locations."
+    )
+    parser.add_argument("--directory", default="rollups")
+    parser.add_argument(
+        "--since",
+        default="2024-11-12",
+        help="Start of the recording, used when no rollups exist yet.",
+    )
+    args = parser.parse_args()
+
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    update_rollups(client, args.directory, args.since)
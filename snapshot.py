@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pandas as pd
+
+import instrumentation
+from measurement_store import compact_measurements, measurement_columns, to_utc
+
+# database function of sql/dashboard_snapshot.sql
+snapshot_function = "dashboard_snapshot"
+# postgrest error code of a function that is not installed
+function_not_found = "PGRST202"
+
+
+def parse_snapshot_measurements(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["location", *measurement_columns])
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True, format="ISO8601")
+    return compact_measurements(df)
+
+
+# batched access to the data of all locations. a single call of the
+# dashboard_snapshot database function returns the locations with their latest
+# timestamp together with the new measurements of every location: the rows
+# after the last cached one, or the last window for locations that are not
+# cached yet. the measurement stores are seeded from that result, so a rerun
+# with all tabs costs one round-trip. without the function, without rpc or
+# without a client the locations are listed and every store is refreshed on its
+# own.
+# get_store(location) returns the measurement store of a location.
+class MeasurementSnapshot:
+
+    def __init__(
+        self,
+        client,
+        get_store,
+        window: pd.Timedelta,
+        refresh_interval: float = 60,
+        archive=None,
+    ):
+        self.client = client
+        self.get_store = get_store
+        self.window = pd.Timedelta(window)
+        self.refresh_interval = refresh_interval
+        self.archive = archive
+        self.locations = []
+        self.last_refresh = None
+        # clients without rpc, like the streamlit connection, are refreshed
+        # per location
+        self.batched = client is not None and hasattr(client, "rpc")
+        self.lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> dict:
+        # returns the new measurements per location
+        with self.lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self.last_refresh is not None
+                and now - self.last_refresh < self.refresh_interval
+            ):
+                return {}
+            self.last_refresh = now
+
+            if self.batched:
+                try:
+                    return self._refresh_batched()
+                except Exception as e:
+                    # only stop trying if the function is not installed, other
+                    # errors are retried on the next refresh
+                    if getattr(e, "code", None) == function_not_found:
+                        self.batched = False
+                    print(f"Batched refresh failed, refreshing per location: {e}")
+            return self._refresh_per_location(force)
+
+    def _refresh_batched(self) -> dict:
+        cursors = {}
+        for location in self.locations:
+            last_timestamp = self.get_store(location).last_timestamp
+            if last_timestamp is not None:
+                cursors[location] = last_timestamp.isoformat()
+        with instrumentation.span("supabase.snapshot"):
+            data = (
+                self.client.rpc(
+                    snapshot_function,
+                    {
+                        "cursors": cursors,
+                        "window_seconds": int(self.window.total_seconds()),
+                    },
+                )
+                .execute()
+                .data
+            )
+        instrumentation.count("supabase_requests")
+        measurements = parse_snapshot_measurements(data["measurements"])
+        instrumentation.count("rows_fetched", len(measurements))
+
+        by_location = dict(
+            list(measurements.groupby("location", sort=False, observed=True))
+        )
+        new = {}
+        for row in data["locations"]:
+            location = row["location"]
+            rows = by_location.get(location, measurements.iloc[:0])
+            start = None
+            if row["latest"] is not None:
+                start = to_utc(row["latest"]) - self.window
+            new[location] = self.get_store(location).extend(
+                rows.drop(columns="location").reset_index(drop=True), start=start
+            )
+        self.locations = list(new)
+        return new
+
+    def _refresh_per_location(self, force: bool) -> dict:
+        if self.client is None:
+            self.locations = self.archive.locations()
+        else:
+            with instrumentation.span("supabase.locations"):
+                rows = self.client.table("locations").select("location").execute().data
+            instrumentation.count("supabase_requests")
+            self.locations = [row["location"] for row in rows]
+        return {
+            location: self.get_store(location).refresh(force=force)
+            for location in self.locations
+        }
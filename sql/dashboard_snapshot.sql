@@ -0,0 +1,53 @@
+-- everything the dashboard needs on first paint in one round-trip, called as
+-- client.rpc("dashboard_snapshot", {"cursors": ..., "window_seconds": ...}).
+-- cursors maps a location to the created_at of its last cached measurement, the
+-- rows after it are returned. locations without a cursor get the measurements
+-- of the last window_seconds before their latest measurement.
+create or replace function dashboard_snapshot(cursors jsonb, window_seconds integer)
+returns jsonb
+language sql
+stable
+as $$
+  with latest as (
+    select
+      l.location,
+      (
+        select max(m.created_at)
+        from measurements m
+        where m.location = l.location
+      ) as latest
+    from locations l
+  ),
+  rows as (
+    select m.location, m.created_at, m.temperature, m.humidity
+    from latest
+    join measurements m on m.location = latest.location
+    where case
+      when cursors ? latest.location
+        then m.created_at > (cursors ->> latest.location)::timestamptz
+      else m.created_at >= latest.latest - make_interval(secs => window_seconds)
+    end
+  )
+  select jsonb_build_object(
+    'locations',
+    (
+      select coalesce(
+        jsonb_agg(jsonb_build_object('location', location, 'latest', latest)),
+        '[]'::jsonb
+      )
+      from latest
+    ),
+    'measurements',
+    (
+      select coalesce(
+        jsonb_agg(to_jsonb(rows) order by rows.location, rows.created_at),
+        '[]'::jsonb
+      )
+      from rows
+    )
+  );
+$$;
+
+-- the latest timestamp and the windows are index range scans
+create index if not exists measurements_location_created_at
+  on measurements (location, created_at);
@@ -0,0 +1,7 @@
+-- batched inserts of ingestion.py skip readings that are already stored, which
+-- needs a unique key on (location, created_at). it also serves the range
+-- queries of the dashboard, so it replaces the index of dashboard_snapshot.sql.
+-- existing duplicates have to be removed before the index can be created.
+create unique index if not exists measurements_location_created_at_key
+  on measurements (location, created_at);
+drop index if exists measurements_location_created_at;
@@ -0,0 +1,168 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from measurement_store import to_utc
+
+statistics_columns = ["temperature", "humidity"]
+# fixed histogram bins per column. the histograms of several days can simply be
+# added up, which makes them a mergeable sketch for the percentiles. the edges
+# lie halfway between the sensor steps (0.1 °C, and 0.5 % for the minute means
+# of 1 % readings), so the bin centers are the readings themselves and float32
+# values like 20.6 cannot fall just below an edge into the bin of 20.5.
+histogram_bins = {
+    "temperature": np.linspace(-40.05, 80.05, 1202),
+    "humidity": np.linspace(-0.25, 100.25, 202),
+}
+percentiles = [5, 50, 95]
+
+
+def summarize(minutes: pd.DataFrame) -> dict:
+    # summary of 1 minute rollups. the sums of squares are computed from the
+    # minute means, which is exact as long as there is at most one reading per
+    # minute.
+    count = minutes["count"].to_numpy()
+    valid = count > 0
+    created_at = minutes["created_at"][valid]
+    summary = {
+        "count": int(count.sum()),
+        "first": created_at.min() if valid.any() else pd.NaT,
+        "last": created_at.max() if valid.any() else pd.NaT,
+    }
+    for column in statistics_columns:
+        mean = minutes[column].to_numpy(dtype=float)
+        column_valid = valid & ~np.isnan(mean)
+        mean, weights = mean[column_valid], count[column_valid]
+        bins = histogram_bins[column]
+        summary[column] = {
+            "count": int(weights.sum()),
+            "sum": float((mean * weights).sum()),
+            "sum_sq": float((mean**2 * weights).sum()),
+            "min": minutes[f"{column}_min"]
+            .to_numpy()[column_valid]
+            .min(initial=np.inf),
+            "max": minutes[f"{column}_max"]
+            .to_numpy()[column_valid]
+            .max(initial=-np.inf),
+            # integer counts, a day has at most a few thousand readings
+            "histogram": np.histogram(
+                mean.clip(bins[0], bins[-1]), bins, weights=weights
+            )[0].astype(np.int32),
+        }
+    return summary
+
+
+def merge(summaries: list) -> dict:
+    merged = {
+        "count": sum(s["count"] for s in summaries),
+        "first": min(
+            (s["first"] for s in summaries if s["first"] is not pd.NaT),
+            default=pd.NaT,
+        ),
+        "last": max(
+            (s["last"] for s in summaries if s["last"] is not pd.NaT),
+            default=pd.NaT,
+        ),
+    }
+    for column in statistics_columns:
+        merged[column] = {
+            "count": sum(s[column]["count"] for s in summaries),
+            "sum": sum(s[column]["sum"] for s in summaries),
+            "sum_sq": sum(s[column]["sum_sq"] for s in summaries),
+            "min": min((s[column]["min"] for s in summaries), default=np.inf),
+            "max": max((s[column]["max"] for s in summaries), default=-np.inf),
+            "histogram": sum(
+                (s[column]["histogram"] for s in summaries),
+                np.zeros(len(histogram_bins[column]) - 1, dtype=np.int64),
+            ),
+        }
+    return merged
+
+
+def finalize(summary: dict) -> dict:
+    statistics = {
+        "count": summary["count"],
+        "first": summary["first"],
+        "last": summary["last"],
+    }
+    for column in statistics_columns:
+        s = summary[column]
+        n = s["count"]
+        mean = s["sum"] / n if n else np.nan
+        statistics[f"{column}_mean"] = mean
+        statistics[f"{column}_std"] = (
+            np.sqrt(max(s["sum_sq"] / n - mean**2, 0)) if n else np.nan
+        )
+        statistics[f"{column}_min"] = s["min"] if n else np.nan
+        statistics[f"{column}_max"] = s["max"] if n else np.nan
+        # percentiles are the centers of the histogram bins they fall into
+        cumulative = np.cumsum(s["histogram"])
+        centers = (histogram_bins[column][1:] + histogram_bins[column][:-1]) / 2
+        for p in percentiles:
+            if n:
+                index = np.searchsorted(cumulative, p / 100 * cumulative[-1])
+                statistics[f"{column}_p{p}"] = centers[min(index, len(centers) - 1)]
+            else:
+                statistics[f"{column}_p{p}"] = np.nan
+    return statistics
+
+
+# per-day summaries (count, sum, sum of squares, min, max, first/last timestamp
+# and a histogram per column) of a single location. the statistics of any range
+# are assembled from the summaries of the full days it contains plus the
+# partial days at its edges, so they cost O(days) instead of O(rows).
+class StatisticsIndex:
+
+    def __init__(self):
+        self.days = {}
+        # the index covers the days from start on, days without measurements
+        # have no summary
+        self.start = None
+        self.lock = threading.Lock()
+
+    @property
+    def update_from(self):
+        # the last day may be incomplete, so updates have to start there
+        return max(self.days, default=self.start)
+
+    def update(self, minutes: pd.DataFrame, start=None):
+        # minutes are 1 minute rollups starting at update_from, or at start
+        # (a day) to extend the index backwards. the days from start to the
+        # first indexed day have to be complete.
+        with self.lock:
+            if start is not None and (self.start is None or start < self.start):
+                self.start = start
+            days = minutes["created_at"].dt.floor("1D")
+            for day, day_minutes in minutes.groupby(days):
+                self.days[day] = summarize(day_minutes)
+
+    def get(self, from_date, to_date, fetch_minutes) -> dict:
+        # fetch_minutes(from_date, to_date) returns the 1 minute rollups of the
+        # partial days at the edges of the range
+        from_date = to_utc(from_date).floor("1min")
+        # the range is [from_date, end), the minute of to_date is included
+        end = to_utc(to_date).floor("1min") + pd.Timedelta(minutes=1)
+        first_day = from_date.ceil("1D")
+        end_day = end.floor("1D")
+        with self.lock:
+            summaries = [
+                summary
+                for day, summary in self.days.items()
+                if first_day <= day < end_day
+            ]
+
+        if first_day < end_day:
+            edges = [(from_date, first_day), (end_day, end)]
+        else:
+            edges = [(from_date, end)]
+        for edge_start, edge_end in edges:
+            if edge_start >= edge_end:
+                continue
+            minutes = fetch_minutes(edge_start, edge_end)
+            minutes = minutes[
+                (minutes["created_at"] >= edge_start)
+                & (minutes["created_at"] < edge_end)
+            ]
+            summaries.append(summarize(minutes))
+        return finalize(merge(summaries))
@@ -0,0 +1,205 @@
+import json
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import requests
+
+import instrumentation
+
+api_url = "https://api.sunrisesunset.io/json"
+keys_to_keep = ["date", "timezone", "day_length", "utc_offset"]
+
+
+def compute_sunrise_sunset(
+    date_start: str, date_end: str, lat: float, lon: float
+) -> pd.DataFrame:
+    # sunrise equation (https://en.wikipedia.org/wiki/Sunrise_equation),
+    # accurate to about a minute for non-polar latitudes
+    dates = pd.date_range(date_start, date_end, freq="1D")
+    # days since J2000.0 at noon of each date
+    n = (dates - pd.Timestamp("2000-01-01")).days.to_numpy()
+    mean_solar_time = n - lon / 360
+    mean_anomaly = np.radians((357.5291 + 0.98560028 * mean_solar_time) % 360)
+    center = (
+        1.9148 * np.sin(mean_anomaly)
+        + 0.0200 * np.sin(2 * mean_anomaly)
+        + 0.0003 * np.sin(3 * mean_anomaly)
+    )
+    ecliptic_longitude = np.radians(
+        (np.degrees(mean_anomaly) + center + 180 + 102.9372) % 360
+    )
+    solar_transit = (
+        2451545.0
+        + mean_solar_time
+        + 0.0053 * np.sin(mean_anomaly)
+        - 0.0069 * np.sin(2 * ecliptic_longitude)
+    )
+    declination = np.arcsin(np.sin(ecliptic_longitude) * np.sin(np.radians(23.4397)))
+
+    def to_timestamp(julian_date):
+        timestamp = pd.to_datetime((julian_date - 2440587.5) * 86400, unit="s")
+        return pd.Series(timestamp, index=dates).dt.round("1min").dt.tz_localize("UTC")
+
+    def hour_angle(elevation: float):
+        # NaN if the sun does not reach the elevation on that day
+        with np.errstate(invalid="ignore"):
+            return np.degrees(
+                np.arccos(
+                    (
+                        np.sin(np.radians(elevation))
+                        - np.sin(np.radians(lat)) * np.sin(declination)
+                    )
+                    / (np.cos(np.radians(lat)) * np.cos(declination))
+                )
+            )
+
+    # -0.833° accounts for refraction and the solar disc, -6° is civil twilight
+    sunrise_hour_angle = hour_angle(-0.833)
+    twilight_hour_angle = hour_angle(-6)
+    day_length = pd.to_timedelta(2 * sunrise_hour_angle / 360, unit="D").round("1s")
+
+    df = pd.DataFrame(
+        {
+            "date": dates.strftime("%Y-%m-%d"),
+            "sunrise": to_timestamp(solar_transit - sunrise_hour_angle / 360),
+            "sunset": to_timestamp(solar_transit + sunrise_hour_angle / 360),
+            "dawn": to_timestamp(solar_transit - twilight_hour_angle / 360),
+            "dusk": to_timestamp(solar_transit + twilight_hour_angle / 360),
+            "solar_noon": to_timestamp(solar_transit),
+            "day_length": day_length.astype(str).str.removeprefix("0 days "),
+        }
+    )
+    return df.reset_index(drop=True)
+
+
+def convert_api_results(raw_results: list) -> pd.DataFrame:
+    df = pd.DataFrame(raw_results)
+    # merge the 12-hour times with the date and round to nearest minute in a
+    # single pass per column
+    keys_to_convert = [key for key in df.columns if key not in keys_to_keep]
+    for key in keys_to_convert:
+        df[key] = (
+            pd.to_datetime(
+                df["date"] + " " + df[key],
+                format="%Y-%m-%d %I:%M:%S %p",
+                errors="coerce",
+            )
+            .dt.round("1min")
+            .dt.tz_localize("UTC")
+        )
+    return df
+
+
+def convert_timezone(df: pd.DataFrame, timezone: str) -> pd.DataFrame:
+    for key in df.columns:
+        if isinstance(df[key].dtype, pd.DatetimeTZDtype):
+            df[key] = df[key].dt.tz_convert(timezone)
+    return df
+
+
+# per-day cache of the raw api results, persisted in sqlite and keyed by date
+# and location, so that any range is assembled from the cached days and only
+# days that have not been seen before are requested
+class SunriseSunsetCache:
+
+    def __init__(self, path: str):
+        self.path = path
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sunrise_sunset (
+                    lat REAL,
+                    lon REAL,
+                    date TEXT,
+                    result TEXT,
+                    PRIMARY KEY (lat, lon, date)
+                )
+                """
+            )
+
+    def get(self, date_start: str, date_end: str, lat: float, lon: float) -> list:
+        with sqlite3.connect(self.path) as connection:
+            rows = connection.execute(
+                """
+                SELECT result FROM sunrise_sunset
+                WHERE lat = ? AND lon = ? AND date BETWEEN ? AND ?
+                ORDER BY date
+                """,
+                (lat, lon, date_start, date_end),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def put(self, results: list, lat: float, lon: float):
+        with sqlite3.connect(self.path) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO sunrise_sunset VALUES (?, ?, ?, ?)",
+                [(lat, lon, r["date"], json.dumps(r)) for r in results],
+            )
+
+
+def fetch_sunrise_sunset_results(
+    date_start: str, date_end: str, lat: float, lon: float
+) -> list:
+    with instrumentation.span("sunrise_sunset.request"):
+        response = requests.get(
+            api_url,
+            params={
+                "timezone": "UTC",
+                "lat": lat,
+                "lng": lon,
+                "date_start": date_start,
+                "date_end": date_end,
+            },
+            timeout=10,
+        )
+    instrumentation.count("sunrise_sunset_requests")
+    instrumentation.count("bytes_fetched", len(response.content))
+    if response.status_code != 200:
+        raise ValueError("Failed to fetch sunrise/sunset data.")
+    return response.json()["results"]
+
+
+def get_sunrise_sunset_data(
+    date_start: str,
+    date_end: str,
+    lat: float,
+    lon: float,
+    timezone: str = "UTC",
+    cache: SunriseSunsetCache = None,
+    offline: bool = False,
+) -> pd.DataFrame:
+    # assert date is in YYYY-MM-DD format
+    regex = re.compile(r"\d{4}-\d{2}-\d{2}")
+    assert regex.match(date_start) and regex.match(date_end), "Invalid date format."
+
+    if offline:
+        df = compute_sunrise_sunset(date_start, date_end, lat, lon)
+    else:
+        results = cache.get(date_start, date_end, lat, lon) if cache else []
+        cached_dates = {r["date"] for r in results}
+        missing_dates = [
+            date
+            for date in pd.date_range(date_start, date_end).strftime("%Y-%m-%d")
+            if date not in cached_dates
+        ]
+        instrumentation.count("sunrise_sunset_cache_hits", len(cached_dates))
+        instrumentation.count("sunrise_sunset_cache_misses", len(missing_dates))
+        if missing_dates:
+            try:
+                # one request spanning all missing days
+                new_results = fetch_sunrise_sunset_results(
+                    missing_dates[0], missing_dates[-1], lat, lon
+                )
+            except (requests.RequestException, ValueError):
+                # the api is not reachable, compute the whole range locally
+                df = compute_sunrise_sunset(date_start, date_end, lat, lon)
+                return convert_timezone(df, timezone)
+            new_results = [r for r in new_results if r["date"] not in cached_dates]
+            if cache:
+                cache.put(new_results, lat, lon)
+            results = sorted(results + new_results, key=lambda r: r["date"])
+        df = convert_api_results(results)
+
+    return convert_timezone(df, timezone)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the tests import the dashboard modules and the fake supabase client of the
+# benchmarks
+root = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, "benchmarks"))
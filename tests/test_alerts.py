@@ -0,0 +1,49 @@
+import pandas as pd
+
+from alerts import AlertEngine, ThresholdRule
+
+
+def measurements(start: str, temperatures: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "created_at": pd.date_range(
+                start, periods=len(temperatures), freq="1min", tz="UTC"
+            ),
+            "temperature": temperatures,
+        }
+    )
+
+
+def make_engine() -> AlertEngine:
+    return AlertEngine([ThresholdRule("temperature", 15, 25, cooldown=0)])
+
+
+def test_alerts_are_raised_and_cleared_with_hysteresis():
+    engine = make_engine()
+    engine.process("living", measurements("2024-11-12", [20, 26, 24.8, 24]))
+    assert [a.kind for a in engine.alerts_since("living", 0)] == ["High"]
+    assert engine.active_alerts("living") == {}
+
+
+def test_measurements_are_evaluated_once():
+    engine = make_engine()
+    df = measurements("2024-11-12 12:00", [20, 26, 20])
+    engine.process("living", df)
+    # passed on twice, and older rows like a backfill
+    engine.process("living", df)
+    engine.process("living", measurements("2024-11-12 11:00", [10, 20]))
+    assert len(engine.alerts_since("living", 0)) == 1
+    engine.process("living", measurements("2024-11-12 12:03", [10]))
+    assert [a.kind for a in engine.alerts_since("living", 0)] == ["High", "Low"]
+
+
+def test_only_alerts_after_the_last_alert_id_are_returned():
+    engine = make_engine()
+    engine.process("living", measurements("2024-11-12", [26, 20]))
+    last_alert_id = engine.last_alert_id()
+    assert engine.alerts_since("living", last_alert_id) == []
+    engine.process("office", measurements("2024-11-12", [10]))
+    engine.process("living", measurements("2024-11-12 00:05", [10]))
+    assert [a.location for a in engine.alerts_since("living", last_alert_id)] == [
+        "living"
+    ]
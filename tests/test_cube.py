@@ -0,0 +1,50 @@
+import pandas as pd
+
+from cube import HourlyCube
+from measurement_store import compact_measurements
+from rollups import compute_rollup
+from synthetic import generate_measurements
+
+
+def hourly_rollups(days: int) -> pd.DataFrame:
+    raw = generate_measurements(days, location="living")
+    return compute_rollup(
+        compact_measurements(raw[["created_at", "temperature", "humidity"]]), "1h"
+    )
+
+
+def test_extending_backwards_matches_a_cube_of_all_hours():
+    hourly = hourly_rollups(10)
+    full = HourlyCube()
+    full.update(hourly)
+
+    created_at = hourly["created_at"]
+    cube = HourlyCube()
+    # the last 3 days, then a further update and the days before
+    start = created_at.iloc[-72]
+    cube.update(
+        hourly[(created_at >= start) & (created_at < created_at.iloc[-5])],
+        start=start,
+    )
+    cube.update(hourly[created_at >= cube.update_from])
+    cube.update(hourly[created_at < start], start=created_at.iloc[0])
+
+    assert len(cube) == len(full)
+    from_date, to_date = created_at.iloc[0], created_at.iloc[-1]
+    pd.testing.assert_frame_equal(
+        cube.heatmap(from_date, to_date), full.heatmap(from_date, to_date)
+    )
+    pd.testing.assert_frame_equal(
+        cube.calendar(from_date, to_date), full.calendar(from_date, to_date)
+    )
+
+
+def test_hours_before_the_first_rollup_are_empty():
+    hourly = hourly_rollups(2)
+    cube = HourlyCube()
+    start = hourly["created_at"].iloc[0] - pd.Timedelta(days=1)
+    cube.update(hourly, start=start)
+    assert cube.start == start
+    assert len(cube) == len(hourly) + 24
+    heatmap = cube.heatmap(start, hourly["created_at"].iloc[-1])
+    assert heatmap["day"].min() == hourly["created_at"].iloc[0].floor("1D")
@@ -0,0 +1,59 @@
+import io
+
+import pandas as pd
+import pytest
+
+from export import export_measurements
+from fake_supabase import FakeSupabaseClient
+from measurement_store import MeasurementStore
+from synthetic import generate_measurements
+
+
+@pytest.fixture
+def stores():
+    # the recording starts 2024-11-12
+    client = FakeSupabaseClient(generate_measurements(8, location="living"))
+    return {"living": MeasurementStore(client, "living")}
+
+
+@pytest.mark.parametrize("resolution", ["raw", "1h"])
+def test_parquet_with_an_empty_leading_chunk(stores, resolution):
+    # the first chunks are before the start of the recording
+    data = export_measurements(
+        stores, "2024-10-20", "2024-11-20", resolution, "Parquet"
+    )
+    df = pd.read_parquet(io.BytesIO(data))
+    assert len(df) > 0
+    assert (df["location"] == "living").all()
+    assert str(df["created_at"].dtype) == "datetime64[ns, UTC]"
+    assert df["temperature"].dtype == "float32"
+    if resolution == "raw":
+        assert len(df) == len(stores["living"].read("2024-10-20", "2024-11-20"))
+    else:
+        assert df["count"].dtype == "int32"
+        assert (df["count"] > 0).all()
+
+
+@pytest.mark.parametrize("with_locations", [True, False])
+def test_parquet_without_rows_is_a_valid_file(stores, with_locations):
+    data = export_measurements(
+        stores if with_locations else {}, "2024-01-01", "2024-02-01", "raw", "Parquet"
+    )
+    df = pd.read_parquet(io.BytesIO(data))
+    assert df.empty
+    assert list(df.columns) == ["location", "created_at", "temperature", "humidity"]
+    assert df["temperature"].dtype == "float32"
+
+
+def test_csv_and_parquet_have_the_same_rows(stores):
+    def export(export_format: str) -> io.BytesIO:
+        return io.BytesIO(
+            export_measurements(
+                stores, "2024-11-12", "2024-11-15", "1h", export_format
+            )
+        )
+
+    parquet = pd.read_parquet(export("Parquet"))
+    csv = pd.read_csv(export("CSV"), parse_dates=["created_at"])
+    assert len(parquet) == len(csv) == 72
+    assert (parquet["count"].to_numpy() == csv["count"].to_numpy()).all()
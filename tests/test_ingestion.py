@@ -0,0 +1,124 @@
+import pandas as pd
+import pytest
+
+from ingestion import MinuteAggregator, Reading, ReadingQueue, SimulatedSensor, flush
+
+
+# records the upserted batches, the first failures requests fail
+class StubClient:
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = 0
+        self.batches = []
+        self.options = []
+
+    def table(self, name: str):
+        assert name == "measurements"
+        return self
+
+    def upsert(self, rows: list, on_conflict: str = None, ignore_duplicates=False):
+        self.rows = rows
+        self.options.append((on_conflict, ignore_duplicates))
+        return self
+
+    def execute(self):
+        self.attempts += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("network is down")
+        self.batches.append(self.rows)
+
+
+def readings(n: int, location: str = "living") -> list:
+    start = pd.Timestamp("2024-11-12", tz="UTC")
+    return [
+        Reading(location, (start + pd.Timedelta(minutes=i)).isoformat(), 20.0, 50.0)
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ReadingQueue(str(tmp_path / "queue.sqlite"))
+
+
+def test_queued_duplicates_are_sent_once(queue):
+    queue.put(readings(10))
+    queue.put(readings(10)[5:])
+    assert len(queue) == 10
+    client = StubClient()
+    assert flush(client, queue, batch_size=4, backoff=0) == 10
+    sent = [row["created_at"] for batch in client.batches for row in batch]
+    assert sent == [r.created_at for r in readings(10)]
+    assert [len(batch) for batch in client.batches] == [4, 4, 2]
+    # a batch that is sent again is skipped by the database
+    assert set(client.options) == {("location,created_at", True)}
+    assert len(queue) == 0
+
+
+def test_the_same_minute_of_different_locations_is_kept(queue):
+    queue.put(readings(3) + readings(3, location="office"))
+    assert len(queue) == 6
+
+
+def test_failed_batches_are_retried(queue):
+    queue.put(readings(5))
+    client = StubClient(failures=2)
+    assert flush(client, queue, retries=3, backoff=0) == 5
+    assert client.attempts == 3
+    assert len(queue) == 0
+
+
+def test_readings_stay_queued_after_the_last_retry(queue, capsys):
+    queue.put(readings(5))
+    client = StubClient(failures=10)
+    assert flush(client, queue, retries=3, backoff=0) == 0
+    assert client.attempts == 4
+    assert len(queue) == 5
+    assert "Failed to insert 5 readings" in capsys.readouterr().out
+    # the next flush sends them
+    client.failures = 0
+    assert flush(client, queue, backoff=0) == 5
+    assert len(queue) == 0
+
+
+def test_batches_sent_before_a_failure_are_removed(queue):
+    queue.put(readings(10))
+
+    class FailingSecondBatch(StubClient):
+        def execute(self):
+            if self.batches:
+                self.attempts += 1
+                raise ConnectionError("network is down")
+            super().execute()
+
+    client = FailingSecondBatch()
+    assert flush(client, queue, batch_size=4, retries=1, backoff=0) == 4
+    assert [r.created_at for r in queue.peek(10)] == [
+        r.created_at for r in readings(10)[4:]
+    ]
+
+
+def test_minute_aggregation():
+    aggregator = MinuteAggregator("living")
+    start = pd.Timestamp("2024-11-12 10:00:05", tz="UTC")
+    assert aggregator.add(start, 20.0, 50.0) == []
+    assert aggregator.add(start + pd.Timedelta(seconds=30), 21.0, 51.0) == []
+    # the first reading of the next minute completes the previous one
+    completed = aggregator.add(start + pd.Timedelta(seconds=60), 22.0, 52.0)
+    assert completed == [Reading("living", "2024-11-12T10:00:00+00:00", 20.5, 50.5)]
+    assert aggregator.flush() == [
+        Reading("living", "2024-11-12T10:01:00+00:00", 22.0, 52.0)
+    ]
+    assert aggregator.flush() == []
+
+
+def test_simulated_sensor_is_reproducible():
+    timestamp = pd.Timestamp("2024-11-12 14:00", tz="UTC")
+    first = SimulatedSensor(seed=1, failure_rate=0).read(timestamp)
+    second = SimulatedSensor(seed=1, failure_rate=0).read(timestamp)
+    assert first == second
+    temperature, humidity = first
+    assert 15 < temperature < 26 and 30 < humidity < 70
+    assert SimulatedSensor(seed=1, failure_rate=1).read(timestamp) is None
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fake_supabase import FakeSupabaseClient
+from measurement_store import MeasurementStore, fetch_measurements
+from synthetic import generate_measurements
+
+
+@pytest.fixture
+def raw():
+    # 20 hours of minutely measurements, including failed reads
+    return generate_measurements(1, location="living").iloc[:1200]
+
+
+@pytest.fixture
+def client(raw):
+    return FakeSupabaseClient(raw)
+
+
+def assert_measurements(df: pd.DataFrame, expected: pd.DataFrame):
+    assert list(df.columns) == ["created_at", "temperature", "humidity"]
+    assert str(df["created_at"].dtype) == "datetime64[ns, UTC]"
+    np.testing.assert_array_equal(
+        df["created_at"].values, expected["created_at"].values
+    )
+    for column in ["temperature", "humidity"]:
+        assert df[column].dtype == np.float32
+        np.testing.assert_array_equal(
+            df[column].to_numpy(), expected[column].to_numpy(dtype=np.float32)
+        )
+
+
+def test_fetches_all_rows_across_pages(client, raw):
+    df = fetch_measurements(client, "living", page_size=70)
+    assert_measurements(df, raw)
+    # 17 full pages and a partial one that ends the pagination
+    assert client.requests == 18
+
+
+def test_continues_after_the_last_timestamp_of_each_page(client, raw):
+    # with a page size that divides the result, an empty page ends it
+    df = fetch_measurements(client, "living", page_size=100)
+    assert_measurements(df, raw)
+    assert client.requests == 13
+    assert df["created_at"].is_unique
+    assert df["created_at"].is_monotonic_increasing
+
+
+def test_single_page_if_the_page_size_exceeds_the_result(client, raw):
+    df = fetch_measurements(client, "living", page_size=5000)
+    assert_measurements(df, raw)
+    assert client.requests == 1
+
+
+def test_after_and_before_are_exclusive(client, raw):
+    created_at = raw["created_at"]
+    df = fetch_measurements(
+        client,
+        "living",
+        after=created_at.iloc[10],
+        before=created_at.iloc[500],
+        page_size=100,
+    )
+    assert_measurements(df, raw.iloc[11:500])
+
+
+def test_from_date_is_inclusive(client, raw):
+    created_at = raw["created_at"]
+    df = fetch_measurements(
+        client, "living", from_date=created_at.iloc[10], before=created_at.iloc[20]
+    )
+    assert_measurements(df, raw.iloc[10:20])
+
+
+def test_after_takes_precedence_over_from_date(client, raw):
+    created_at = raw["created_at"]
+    df = fetch_measurements(
+        client, "living", from_date=created_at.iloc[0], after=created_at.iloc[1189]
+    )
+    assert_measurements(df, raw.iloc[1190:])
+
+
+@pytest.mark.parametrize(
+    "location, after",
+    [
+        ("unknown", None),
+        # nothing newer than the latest measurement
+        ("living", "2024-11-13"),
+    ],
+)
+def test_empty_result(client, location, after):
+    df = fetch_measurements(client, location, after=after)
+    assert df.empty
+    assert_measurements(df, df)
+    assert client.requests == 1
+
+
+def test_every_added_row_is_passed_on(raw):
+    # the client only has the first 600 rows at first
+    client = FakeSupabaseClient(raw.iloc[:600])
+    added = []
+    store = MeasurementStore(
+        client,
+        "living",
+        refresh_interval=0,
+        on_new=lambda location, df: added.append(df),
+    )
+    store.refresh()
+    store.backfill(raw["created_at"].iloc[100])
+    client.measurements["living"] = raw.reset_index(drop=True)
+    store.refresh()
+    store.extend(raw.iloc[1100:1150].drop(columns="location"))
+    passed_on = pd.concat(added).sort_values("created_at")
+    np.testing.assert_array_equal(
+        passed_on["created_at"].values, store.df["created_at"].values
+    )
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from fake_supabase import FakeSupabaseClient
+from measurement_store import MeasurementStore
+from snapshot import MeasurementSnapshot, function_not_found
+from synthetic import generate_measurements
+
+
+# like the streamlit connection of st-supabase-connection, which only exposes
+# table and auth of the supabase client
+class TableOnlyClient:
+
+    def __init__(self, client: FakeSupabaseClient):
+        self.client = client
+        self.table = client.table
+
+
+class MissingFunctionError(Exception):
+
+    def __init__(self):
+        super().__init__("Could not find the function")
+        self.code = function_not_found
+
+
+class MissingFunctionClient(FakeSupabaseClient):
+
+    def rpc(self, name: str, params: dict):
+        self.requests += 1
+        raise MissingFunctionError()
+
+
+@pytest.fixture
+def raw():
+    return pd.concat(
+        [
+            generate_measurements(2, location="living"),
+            generate_measurements(2, location="office", seed=1),
+        ]
+    )
+
+
+def make_snapshot(client) -> MeasurementSnapshot:
+    stores = {}
+
+    def get_store(location: str) -> MeasurementStore:
+        if location not in stores:
+            stores[location] = MeasurementStore(client, location, refresh_interval=0)
+        return stores[location]
+
+    return MeasurementSnapshot(client, get_store, window=pd.Timedelta(hours=6))
+
+
+def test_batched_refresh_is_a_single_request(raw):
+    client = FakeSupabaseClient(raw)
+    snapshot = make_snapshot(client)
+    new = snapshot.refresh()
+    assert client.requests == 1
+    assert snapshot.locations == ["living", "office"]
+    assert set(new) == {"living", "office"}
+    for location, df in new.items():
+        store = snapshot.get_store(location)
+        assert store.last_timestamp == raw[raw["location"] == location][
+            "created_at"
+        ].max()
+        # the window is cached, only the latest measurement is new
+        assert len(store.df) > 300
+        assert len(df) == 1
+
+
+def test_client_without_rpc_refreshes_per_location(raw, capsys):
+    fake = FakeSupabaseClient(raw)
+    snapshot = make_snapshot(TableOnlyClient(fake))
+    assert not snapshot.batched
+    snapshot.refresh()
+    # the locations and the latest measurement of each location
+    assert fake.requests == 3
+    assert snapshot.locations == ["living", "office"]
+    assert snapshot.get_store("living").last_timestamp is not None
+    snapshot.refresh(force=True)
+    assert "Batched refresh failed" not in capsys.readouterr().out
+
+
+def test_missing_function_stops_batching(raw, capsys):
+    client = MissingFunctionClient(raw)
+    snapshot = make_snapshot(client)
+    snapshot.refresh()
+    assert not snapshot.batched
+    assert "Batched refresh failed" in capsys.readouterr().out
+    requests = client.requests
+    snapshot.refresh(force=True)
+    # the function is not called again
+    assert client.requests == requests + 3
+    assert "Batched refresh failed" not in capsys.readouterr().out
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from measurement_store import compact_measurements
+from rollups import compute_rollup
+from statistics_index import StatisticsIndex, percentiles
+from synthetic import generate_measurements
+
+
+@pytest.fixture
+def raw():
+    raw = generate_measurements(5, location="living")
+    return compact_measurements(raw[["created_at", "temperature", "humidity"]])
+
+
+def statistics(raw: pd.DataFrame, from_date, to_date) -> dict:
+    minutes = compute_rollup(raw, "1min")
+    index = StatisticsIndex()
+    index.update(minutes, start=minutes["created_at"].iloc[0].floor("1D"))
+    return index.get(from_date, to_date, lambda start, end: minutes)
+
+
+@pytest.mark.parametrize("hours", [1, 24, 72])
+def test_statistics_match_the_measurements(raw, hours):
+    to_date = raw["created_at"].iloc[-1]
+    from_date = to_date - pd.Timedelta(hours=hours)
+    result = statistics(raw, from_date, to_date)
+    df = raw[raw["created_at"] >= from_date.floor("1min")]
+    assert result["count"] == df["temperature"].count()
+    for column in ["temperature", "humidity"]:
+        values = df[column].dropna().to_numpy(dtype=float)
+        assert result[f"{column}_mean"] == pytest.approx(values.mean(), abs=1e-4)
+        assert result[f"{column}_min"] == pytest.approx(values.min())
+        assert result[f"{column}_max"] == pytest.approx(values.max())
+        # the percentiles are readings at the sensor resolution, not bin centers
+        # between them
+        for p in percentiles:
+            assert result[f"{column}_p{p}"] == pytest.approx(
+                np.percentile(values, p, method="inverted_cdf"), abs=1e-4
+            )